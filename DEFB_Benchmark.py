@@ -0,0 +1,283 @@
+"""
+Benchmark harness for the ZX Spectrum Sprite Sheet to DEFB Converter.
+
+Generates synthetic RGB, RGBA, palette and greyscale sprite sheets, times
+``convert_png_to_zx_defb_pypng`` across the output/transform flag
+combinations plus the .bin to PNG and frame-rendering paths, and writes the
+results as JSON. A compare mode checks a run against a saved baseline and
+fails when any path slows down by more than a threshold.
+
+Usage:
+    python DEFB_Benchmark.py --sizes 256 1024 --json results.json
+    python DEFB_Benchmark.py --sizes 256 1024 --compare results.json --threshold 0.15
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import platform
+import itertools
+import tempfile
+import png
+
+import DEFB_GeneratorV3 as defb
+
+IMAGE_KINDS = ("rgb", "rgba", "palette", "greyscale")
+NUMBER_FORMATS = ("dec", "hex", "bin")
+DEFAULT_SIZES = (256, 512, 1024)
+
+# Background (excluded) colour first, so roughly a quarter of pixels are "off".
+PALETTE = [(0, 0, 0), (255, 255, 255), (200, 10, 10), (4, 3, 6)]
+GREY_LEVELS = [0, 255, 128, 5]
+
+
+def synthetic_rows(size, kind, seed=1234):
+    """
+    Yield the rows of a deterministic pseudo-random sprite sheet.
+
+    A pool of 64 random rows is generated and cycled, which keeps generation of
+    8192x8192 sheets cheap while still giving the converter varied cells.
+
+    Args:
+        size (int): Width and height of the sheet in pixels.
+        kind (str): One of ``IMAGE_KINDS``.
+        seed (int): Random seed.
+
+    Yields:
+        bytes: One row of PNG sample values.
+    """
+    rng = random.Random(seed)
+    pool = []
+    for _ in range(64):
+        indices = [rng.getrandbits(2) for _ in range(size)]
+        if kind == "rgb":
+            row = bytes(c for i in indices for c in PALETTE[i])
+        elif kind == "rgba":
+            row = bytes(c for i in indices for c in PALETTE[i] + (rng.choice((255, 255, 255, 0)),))
+        elif kind == "palette":
+            row = bytes(indices)
+        else:
+            row = bytes(GREY_LEVELS[i] for i in indices)
+        pool.append(row)
+    for y in range(size):
+        yield pool[y % len(pool)]
+
+
+def write_synthetic_png(path, size, kind):
+    """
+    Write a synthetic sprite sheet PNG.
+
+    Args:
+        path (str): Output filename.
+        size (int): Width and height in pixels.
+        kind (str): One of ``IMAGE_KINDS``.
+    """
+    if kind == "palette":
+        writer = png.Writer(size, size, palette=PALETTE, bitdepth=8)
+    elif kind == "greyscale":
+        writer = png.Writer(size, size, greyscale=True, bitdepth=8)
+    else:
+        writer = png.Writer(size, size, greyscale=False, alpha=(kind == "rgba"), bitdepth=8)
+    with open(path, "wb") as f:
+        writer.write(f, synthetic_rows(size, kind))
+
+
+def best_time(func, repeat):
+    """
+    Run ``func`` ``repeat`` times and return the fastest wall time in seconds.
+    """
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def flag_combinations(quick=False):
+    """
+    List the conversion flag combinations to benchmark.
+
+    Args:
+        quick (bool): Only time each flag on its own instead of every combination.
+
+    Returns:
+        list of (str, dict): Case suffix and converter keyword arguments.
+    """
+    combos = []
+    flags = ("inverse", "mirror", "flip_vertical", "preview_ascii")
+    if quick:
+        switches = [()] + [(flag,) for flag in flags]
+        formats = [(fmt, switch) for fmt in NUMBER_FORMATS for switch in ([()] if fmt != "dec" else switches)]
+    else:
+        switches = [
+            tuple(flag for flag, on in zip(flags, mask) if on)
+            for mask in itertools.product((False, True), repeat=len(flags))
+        ]
+        formats = [(fmt, switch) for fmt in NUMBER_FORMATS for switch in switches]
+
+    for fmt, switch in formats:
+        options = {flag: True for flag in switch}
+        options["use_hex"] = fmt == "hex"
+        options["use_bin"] = fmt == "bin"
+        if "mirror" in options:
+            options["mirror_align"] = True  # the CLI always aligns mirrored sprites
+        combos.append(("+".join((fmt,) + switch), options))
+    return combos
+
+
+def run_benchmarks(sizes, kinds, sprite_size, repeat, workdir, use_numpy=None, quick=False):
+    """
+    Time every benchmark case.
+
+    Args:
+        sizes (list of int): Sheet sizes in pixels (square).
+        kinds (list of str): Image kinds from ``IMAGE_KINDS``.
+        sprite_size (int): Sprite width and height in pixels.
+        repeat (int): Runs per case; the fastest is kept.
+        workdir (str): Directory for generated PNG/.bin files.
+        use_numpy (bool, optional): Converter backend (None = automatic).
+        quick (bool): Reduced flag combinations.
+
+    Returns:
+        dict: Case name -> seconds, or an "error: ..." string when a case fails.
+    """
+    results = {}
+
+    def record(name, func):
+        try:
+            results[name] = round(best_time(func, repeat), 6)
+            print(f"{results[name]:>10.4f}s  {name}")
+        except Exception as e:
+            results[name] = f"error: {type(e).__name__}: {e}"
+            print(f"{'FAILED':>11}  {name} ({results[name]})")
+
+    for size in sizes:
+        for kind in kinds:
+            path = os.path.join(workdir, f"{kind}_{size}.png")
+            if not os.path.isfile(path):
+                write_synthetic_png(path, size, kind)
+            for suffix, options in flag_combinations(quick):
+                record(
+                    f"convert/{kind}/{size}/{suffix}",
+                    lambda: defb.convert_png_to_zx_defb_pypng(
+                        path, sprite_width=sprite_size, sprite_height=sprite_size, use_numpy=use_numpy, **options
+                    )
+                )
+
+        sprite_count = (size // sprite_size) ** 2
+        bin_path = os.path.join(workdir, f"bank_{size}.bin")
+        if not os.path.isfile(bin_path):
+            with open(bin_path, "wb") as bf:
+                bf.write(os.urandom(sprite_count * ((sprite_size + 7) // 8) * sprite_size))
+        sprite_data = defb.load_sprite_bank(bin_path)
+        png_out = os.path.join(workdir, f"bank_{size}.png")
+
+        def bin_to_png():
+            defb.write_spectrum_bin_png(sprite_data, sprite_size, sprite_size, png_out, size)
+
+        def bin_frames():
+            for _ in defb.render_spectrum_bin_to_frames(sprite_data, sprite_size, sprite_size):
+                pass
+
+        record(f"bin_to_png/{size}", bin_to_png)
+        record(f"bin_frames/{size}", bin_frames)
+
+    return results
+
+
+def compare_results(current, baseline, threshold, min_seconds):
+    """
+    Compare a run against a baseline and list regressions.
+
+    Args:
+        current (dict): Case name -> seconds for this run.
+        baseline (dict): Case name -> seconds from the baseline file.
+        threshold (float): Allowed slowdown as a fraction (0.1 = 10%).
+        min_seconds (float): Ignore differences smaller than this (timer noise).
+
+    Returns:
+        list of str: Cases that regressed, newly fail or are missing from this run.
+    """
+    regressions = []
+    print(f"\n{'Baseline':>10} {'Current':>10} {'Change':>8}  Case")
+    for name in sorted(set(current) & set(baseline)):
+        old, new = baseline[name], current[name]
+        if isinstance(new, str) and not isinstance(old, str):
+            print(f"{old:>10.4f} {'FAILED':>10} {'':>8}  {name}")
+            regressions.append(name)
+            continue
+        if isinstance(old, str) or isinstance(new, str):
+            continue
+        change = (new - old) / old if old else 0.0
+        regressed = new > old * (1 + threshold) and new - old > min_seconds
+        marker = "  <-- REGRESSION" if regressed else ""
+        print(f"{old:>10.4f} {new:>10.4f} {change:>+7.1%}  {name}{marker}")
+        if regressed:
+            regressions.append(name)
+    # A case that stopped running must not pass the comparison by omission.
+    for name in sorted(set(baseline) - set(current)):
+        old = baseline[name]
+        old_text = f"{old:>10.4f}" if not isinstance(old, str) else f"{'FAILED':>10}"
+        print(f"{old_text} {'MISSING':>10} {'':>8}  {name}")
+        regressions.append(name)
+    return regressions
+
+
+def main():
+    """
+    Entry point for the benchmark harness.
+    """
+    parser = argparse.ArgumentParser(description="Benchmark the PNG to DEFB converter.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES), help="Square sheet sizes in pixels (256 to 8192)")
+    parser.add_argument("--kinds", nargs="+", choices=IMAGE_KINDS, default=list(IMAGE_KINDS), help="PNG colour types to generate")
+    parser.add_argument("--sprite_size", type=int, default=16, help="Sprite width/height in pixels (default: 16)")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per case, fastest is kept (default: 3)")
+    parser.add_argument("--quick", action="store_true", help="Time each flag on its own rather than every combination")
+    parser.add_argument("--no-numpy", action="store_true", help="Benchmark the pure-Python converter")
+    parser.add_argument("--workdir", help="Directory for generated sheets (default: a temporary directory)")
+    parser.add_argument("--json", help="Write results to this JSON file")
+    parser.add_argument("--compare", help="Baseline JSON file to compare against")
+    parser.add_argument("--threshold", type=float, default=0.10, help="Allowed slowdown before failing, as a fraction (default: 0.10)")
+    parser.add_argument("--min_seconds", type=float, default=0.005, help="Ignore slowdowns smaller than this many seconds (default: 0.005)")
+    args = parser.parse_args()
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix="defb_bench_")
+    os.makedirs(workdir, exist_ok=True)
+
+    results = run_benchmarks(
+        args.sizes, args.kinds, args.sprite_size, args.repeat, workdir,
+        use_numpy=False if args.no_numpy else None, quick=args.quick
+    )
+    report = {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "numpy": getattr(defb.np, "__version__", None) if not args.no_numpy else None,
+            "sprite_size": args.sprite_size,
+            "repeat": args.repeat,
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "results": results,
+    }
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nResults written to {args.json}")
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)["results"]
+        regressions = compare_results(results, baseline, args.threshold, args.min_seconds)
+        if regressions:
+            print(f"\n❌ {len(regressions)} case(s) regressed by more than {args.threshold:.0%} or are missing")
+            sys.exit(1)
+        print(f"\n✅ No regressions beyond {args.threshold:.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -15,10 +15,45 @@ import os
 import sys
 import time
 import math
+import mmap
+import stat
+import tempfile
+import copy
+import array
+import io
+import json
+import re
+import base64
+import socket
+import hashlib
+import cProfile
+import contextlib
+import tracemalloc
+import glob
+import shlex
+import itertools
+import collections
+import collections.abc
+import concurrent.futures
+import socketserver
+import http.server
+import urllib.error
+import urllib.request
 import argparse
 import platform
 import png
 
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional, the pure-Python path is always available
+    np = None
+_numpy_fallback_warned = False  # make_sprite_packer warns once per process
+
+# Bump when the converter output changes so stale cache entries are ignored.
+CACHE_FORMAT_VERSION = 1
+DEFAULT_CACHE_SIZE_MB = 256
+DEFAULT_IMAGE_CACHE_MB = 256
+
 if platform.system() == "Windows":
     import msvcrt
 else:
@@ -26,16 +61,6 @@ else:
     import tty
     import select
 
-def key_pressed():
-    """
-    Check if a key has been pressed (cross-platform, no admin rights).
-    """
-    if platform.system() == "Windows":
-        return msvcrt.kbhit()
-    else:
-        dr, _, _ = select.select([sys.stdin], [], [], 0)
-        return bool(dr)
-    
 def read_key():
     """Read one character from stdin to consume the key press."""
     if platform.system() == "Windows":
@@ -44,12 +69,34 @@ def read_key():
         fd = sys.stdin.fileno()
         old_settings = termios.tcgetattr(fd)
         try:
-            tty.setraw(fd)
+            tty.setraw(fd, termios.TCSANOW)  # TCSAFLUSH would discard the pending key
             return sys.stdin.read(1)
         finally:
             termios.tcsetattr(fd, termios.TCSADRAIN, old_settings)
 
     
+def wait_for_key(timeout):
+    """
+    Wait up to ``timeout`` seconds for a key press without spinning the CPU.
+
+    Args:
+        timeout (float): Seconds to wait (0 just polls).
+
+    Returns:
+        bool: True if a key is waiting to be read.
+    """
+    if platform.system() == "Windows":
+        deadline = time.monotonic() + timeout
+        while not msvcrt.kbhit():
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            time.sleep(min(remaining, 0.02))
+        return True
+    dr, _, _ = select.select([sys.stdin], [], [], max(timeout, 0))
+    return bool(dr)
+
+
 def print_banner(version: str):
     banner = r"""
  ______    _______  _______  ______    _______      
@@ -77,58 +124,120 @@ def print_banner(version: str):
     print(f"\n{banner}\nRetro Sprite Magic Version - {version}")
 
 
-def render_spectrum_bin_to_frames(sprite_data, sprite_width, sprite_height):
+def load_sprite_bank(path):
     """
-    Convert ZX Spectrum sprite binary data into a list of individual sprite frames.
+    Map a ZX Spectrum sprite .bin file into memory without reading it.
 
     Args:
-        sprite_data (bytes): Raw ZX Spectrum sprite data.
+        path (str): Path to the .bin file.
+
+    Returns:
+        memoryview: Read-only view of the file contents (pages are loaded on access).
+    """
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return memoryview(b"")  # mmap cannot map an empty file
+        # The mapping stays valid after the file is closed.
+        return memoryview(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+
+
+def decode_sprite_frame(sprite_data, sprite_index, sprite_width, sprite_height):
+    """
+    Decode one sprite from ZX Spectrum sprite binary data.
+
+    Args:
+        sprite_data (bytes or memoryview): Raw ZX Spectrum sprite data.
+        sprite_index (int): Index of the sprite within the data.
         sprite_width (int): Width of a single sprite in pixels.
         sprite_height (int): Height of a single sprite in pixels.
 
     Returns:
-        list of list of list of int: Each frame is a 2D array of greyscale pixel values.
+        list of list of int: 2D array of greyscale pixel values.
     """
     bytes_per_row = (sprite_width + 7) // 8
-    bytes_per_sprite = bytes_per_row * sprite_height
-    total_sprites = len(sprite_data) // bytes_per_sprite
+    base = sprite_index * bytes_per_row * sprite_height
+    frame = []
+    for row in range(sprite_height):
+        row_offset = base + row * bytes_per_row
+        row_bytes = sprite_data[row_offset:row_offset + bytes_per_row]
+        frame.append(list(b"".join([BYTE_TO_PIXELS[byte] for byte in row_bytes])[:sprite_width]))
+    return frame
 
-    frames = []
-    for sprite_index in range(total_sprites):
-        base = sprite_index * bytes_per_sprite
-        frame = []
-        for row in range(sprite_height):
-            row_pixels = []
-            row_offset = base + row * bytes_per_row
-            for byte_index in range(bytes_per_row):
-                byte = sprite_data[row_offset + byte_index]
-                for bit in range(8):
-                    pixel_x = byte_index * 8 + bit
-                    if pixel_x >= sprite_width:
-                        continue
-                    pixel_on = (byte & (1 << (7 - bit))) != 0
-                    row_pixels.append(255 if pixel_on else 0)
-            frame.append(row_pixels)
-        frames.append(frame)
-    return frames
 
+class SpriteFrames(collections.abc.Sequence):
+    """
+    Lazy sequence of sprite frames over ZX Spectrum sprite binary data.
 
-def render_spectrum_bin_to_image(sprite_data, sprite_width, sprite_height, texture_width=None):
+    Frames are decoded with ``decode_sprite_frame`` only when indexed or
+    iterated, so large (memory-mapped) banks cost nothing up front.
     """
-    Convert ZX Spectrum sprite binary data into a 2D greyscale image array.
+
+    def __init__(self, sprite_data, sprite_width, sprite_height):
+        self.sprite_data = sprite_data
+        self.sprite_width = sprite_width
+        self.sprite_height = sprite_height
+        self.bytes_per_sprite = ((sprite_width + 7) // 8) * sprite_height
+
+    def __len__(self):
+        return len(self.sprite_data) // self.bytes_per_sprite
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("sprite frame index out of range")
+        return decode_sprite_frame(self.sprite_data, index, self.sprite_width, self.sprite_height)
+
+    def ascii_lines(self, index):
+        """
+        Render one frame straight to ASCII preview lines (no pixel list).
+
+        Args:
+            index (int): Sprite index.
+
+        Returns:
+            list of str: One string per sprite row.
+        """
+        bytes_per_row = (self.sprite_width + 7) // 8
+        base = index * self.bytes_per_sprite
+        return [
+            "".join(BYTE_TO_GLYPHS[byte] for byte in self.sprite_data[offset:offset + bytes_per_row])[:self.sprite_width]
+            for offset in range(base, base + self.bytes_per_sprite, bytes_per_row)
+        ]
+
+
+def render_spectrum_bin_to_frames(sprite_data, sprite_width, sprite_height):
+    """
+    Convert ZX Spectrum sprite binary data into a sequence of individual sprite frames.
 
     Args:
-        sprite_data (bytes): Raw ZX Spectrum sprite data.
+        sprite_data (bytes or memoryview): Raw ZX Spectrum sprite data.
         sprite_width (int): Width of a single sprite in pixels.
         sprite_height (int): Height of a single sprite in pixels.
-        sprites_per_row (int, optional): Number of sprites per row in the output image.
 
     Returns:
-        list of list of int: 2D greyscale image data (0 = background, 255 = pixel on).
+        SpriteFrames: Lazy sequence; each frame is a 2D array of greyscale pixel values.
+    """
+    return SpriteFrames(sprite_data, sprite_width, sprite_height)
+
+
+def bin_sheet_layout(sprite_data, sprite_width, sprite_height, texture_width=None):
+    """
+    Work out how the sprites of a .bin bank are laid out on a rendered sheet.
+
+    Args:
+        sprite_data (bytes or memoryview): Raw ZX Spectrum sprite data.
+        sprite_width (int): Width of a single sprite in pixels.
+        sprite_height (int): Height of a single sprite in pixels.
+        texture_width (int, optional): Maximum sheet width in pixels (None or 0 = square-ish).
+
+    Returns:
+        tuple: (total_sprites, sprites_per_row, sprites_per_column).
     """
     rounded_width = ((sprite_width + 7) // 8) * 8
-    bytes_per_row = (sprite_width + 7) // 8
-    bytes_per_sprite = bytes_per_row * sprite_height
+    bytes_per_sprite = ((sprite_width + 7) // 8) * sprite_height
     total_sprites = len(sprite_data) // bytes_per_sprite
 
     # Filed under, Bob will test a value of zero...
@@ -139,6 +248,27 @@ def render_spectrum_bin_to_image(sprite_data, sprite_width, sprite_height, textu
         sprites_per_row = min(texture_width // rounded_width, total_sprites)
 
     sprites_per_column = math.ceil(total_sprites / sprites_per_row)
+    return total_sprites, sprites_per_row, sprites_per_column
+
+
+def render_spectrum_bin_to_image(sprite_data, sprite_width, sprite_height, texture_width=None):
+    """
+    Convert ZX Spectrum sprite binary data into a 2D greyscale image array.
+
+    Args:
+        sprite_data (bytes): Raw ZX Spectrum sprite data.
+        sprite_width (int): Width of a single sprite in pixels.
+        sprite_height (int): Height of a single sprite in pixels.
+        sprites_per_row (int, optional): Number of sprites per row in the output image.
+
+    Returns:
+        list of list of int: 2D greyscale image data (0 = background, 255 = pixel on).
+    """
+    bytes_per_row = (sprite_width + 7) // 8
+    bytes_per_sprite = bytes_per_row * sprite_height
+    total_sprites, sprites_per_row, sprites_per_column = bin_sheet_layout(
+        sprite_data, sprite_width, sprite_height, texture_width
+    )
 
     image_width = sprites_per_row * sprite_width
     image_height = sprites_per_column * sprite_height
@@ -152,30 +282,82 @@ def render_spectrum_bin_to_image(sprite_data, sprite_width, sprite_height, textu
 
         for row in range(sprite_height):
             row_offset = base + row * bytes_per_row
-            for byte_index in range(bytes_per_row):
-                byte = sprite_data[row_offset + byte_index]
-                for bit in range(8):
-                    pixel_x = byte_index * 8 + bit
-                    if pixel_x >= sprite_width:
-                        continue
-                    pixel_on = (byte & (1 << (7 - bit))) != 0
-                    image_data[y_offset + row][x_offset + pixel_x] = 255 if pixel_on else 0
+            row_bytes = sprite_data[row_offset:row_offset + bytes_per_row]
+            row_pixels = b"".join([BYTE_TO_PIXELS[byte] for byte in row_bytes])[:sprite_width]
+            image_data[y_offset + row][x_offset:x_offset + sprite_width] = row_pixels
 
     return image_data
 
-def write_image_to_png(image_data, output_filename):
+
+def iter_spectrum_bin_rows(sprite_data, sprite_width, sprite_height, texture_width=None):
     """
-    Write a 2D greyscale pixel array to a PNG file using pypng.
+    Yield the rows of a rendered .bin sheet as packed 1-bit scanlines.
+
+    Spectrum sprite rows are already 1 bit per pixel, MSB first, so for
+    byte-aligned sprite widths each scanline is just the matching row of
+    every sprite on that sheet row copied end to end. Other widths are
+    spliced together bit by bit. Only one scanline exists at a time.
 
     Args:
-        image_data (list of list of int): 2D array of greyscale pixel values.
+        sprite_data (bytes or memoryview): Raw ZX Spectrum sprite data.
+        sprite_width (int): Width of a single sprite in pixels.
+        sprite_height (int): Height of a single sprite in pixels.
+        texture_width (int, optional): Maximum sheet width in pixels.
+
+    Yields:
+        bytes: One scanline of ``ceil(image_width / 8)`` bytes (1 = pixel on).
+    """
+    bytes_per_row = (sprite_width + 7) // 8
+    bytes_per_sprite = bytes_per_row * sprite_height
+    total_sprites, sprites_per_row, sprites_per_column = bin_sheet_layout(
+        sprite_data, sprite_width, sprite_height, texture_width
+    )
+    scanline_bytes = (sprites_per_row * sprite_width + 7) // 8
+    spare_bits = bytes_per_row * 8 - sprite_width
+
+    for sheet_row in range(sprites_per_column):
+        first = sheet_row * sprites_per_row
+        count = min(sprites_per_row, total_sprites - first)
+        for row in range(sprite_height):
+            start = first * bytes_per_sprite + row * bytes_per_row
+            stop = start + count * bytes_per_sprite
+            if bytes_per_row == 1 and not spare_bits:
+                line = bytes(sprite_data[start:stop:bytes_per_sprite])
+            elif not spare_bits:
+                line = b"".join([sprite_data[offset:offset + bytes_per_row] for offset in range(start, stop, bytes_per_sprite)])
+            else:
+                bits = 0
+                for offset in range(start, stop, bytes_per_sprite):
+                    bits = (bits << sprite_width) | (int.from_bytes(sprite_data[offset:offset + bytes_per_row], "big") >> spare_bits)
+                line = (bits << (scanline_bytes * 8 - count * sprite_width)).to_bytes(scanline_bytes, "big")
+            yield line.ljust(scanline_bytes, b"\x00")
+
+
+def write_spectrum_bin_png(sprite_data, sprite_width, sprite_height, output_filename, texture_width=None):
+    """
+    Render ZX Spectrum sprite binary data straight to a 1-bit greyscale PNG.
+
+    Scanlines come from ``iter_spectrum_bin_rows`` and are handed to pypng
+    already packed, so no pixel array is built and memory use does not grow
+    with the size of the bank.
+
+    Args:
+        sprite_data (bytes or memoryview): Raw ZX Spectrum sprite data.
+        sprite_width (int): Width of a single sprite in pixels.
+        sprite_height (int): Height of a single sprite in pixels.
         output_filename (str): Path to save PNG file.
+        texture_width (int, optional): Maximum sheet width in pixels.
+
+    Returns:
+        tuple: (width, height) of the written image in pixels.
     """
-    height = len(image_data)
-    width = len(image_data[0])
+    _, sprites_per_row, sprites_per_column = bin_sheet_layout(sprite_data, sprite_width, sprite_height, texture_width)
+    width, height = sprites_per_row * sprite_width, sprites_per_column * sprite_height
     with open(output_filename, "wb") as f:
-        writer = png.Writer(width=width, height=height, greyscale=True, bitdepth=8)
-        writer.write(f, image_data)
+        writer = png.Writer(width=width, height=height, greyscale=True, bitdepth=1)
+        writer.write_packed(f, iter_spectrum_bin_rows(sprite_data, sprite_width, sprite_height, texture_width))
+    return width, height
+
 
 def ascii_preview_from_image(image_data):
     """
@@ -194,36 +376,111 @@ def ascii_preview_from_image(image_data):
     return '\n'.join(preview)
 
 
+def frame_ascii_lines(frame):
+    """
+    Return a frame as a list of ASCII lines.
+
+    Args:
+        frame (list): Either a 2D pixel frame or pre-rendered ASCII lines.
+
+    Returns:
+        list of str: One string per row.
+    """
+    if isinstance(frame, list) and all(isinstance(line, str) for line in frame):
+        return frame
+    return ascii_preview_from_image(frame).split("\n")
+
+
+def redraw_ascii_lines(previous, current):
+    """
+    Build the terminal output that turns ``previous`` into ``current`` on screen.
+
+    Only the changed span of each changed row is written, using cursor
+    positioning; rows or columns that disappear are blanked.
+
+    Args:
+        previous (list of str): Lines currently on screen (top-left origin).
+        current (list of str): Lines to show.
+
+    Returns:
+        str: Escape sequences and text to write.
+    """
+    parts = []
+    for y in range(max(len(previous), len(current))):
+        old = previous[y] if y < len(previous) else ""
+        new = current[y] if y < len(current) else ""
+        if old == new:
+            continue
+        width = max(len(old), len(new))
+        old, new = old.ljust(width), new.ljust(width)
+        if old == new:
+            continue
+        start = 0
+        while old[start] == new[start]:
+            start += 1
+        end = width
+        while old[end - 1] == new[end - 1]:
+            end -= 1
+        parts.append(f"\033[{y + 1};{start + 1}H{new[start:end]}")
+    return "".join(parts)
+
+
 def animate_ascii_preview(frames, delay=0.25):
     """
     Animate a sequence of sprite frames or ASCII art frames with key interrupt support.
 
+    Each frame's text is built once and cached, only the characters that
+    differ from the previous frame are redrawn, and frames are scheduled
+    against a monotonic clock so render time doesn't stretch the delay.
+
     Args:
         frames (list): Either 2D pixel frames or pre-rendered ASCII string frames.
+            A ``SpriteFrames`` sequence is rendered straight from its bytes.
         delay (float): Time in seconds between frames.
     """
+    if not isinstance(frames, collections.abc.Sequence):
+        frames = list(frames)
+    if not frames:
+        return
+    rendered = [None] * len(frames)
+
     if platform.system() != "Windows":
         fd = sys.stdin.fileno()
         old_settings = termios.tcgetattr(fd)
         tty.setcbreak(fd)
     else:
         old_settings = None  # no-op for Windows
+        os.system("")  # enables ANSI escape handling in the Windows console
 
+    out = sys.stdout
+    on_screen = []
+    out.write("\033[?25l\033[H\033[2J")  # hide cursor, clear once
     try:
+        next_frame = time.monotonic()
         while True:
-            for frame in frames:
-                print("\033[H\033[J", end="") if platform.system() != "Windows" else os.system("cls")
-                if isinstance(frame, list) and all(isinstance(line, str) for line in frame):
-                    print('\n'.join(frame))
-                else:
-                    print(ascii_preview_from_image(frame))
-                time.sleep(delay)
-                if key_pressed():
+            for index in range(len(frames)):
+                if rendered[index] is None:
+                    if isinstance(frames, SpriteFrames):
+                        rendered[index] = frames.ascii_lines(index)
+                    else:
+                        rendered[index] = frame_ascii_lines(frames[index])
+                out.write(redraw_ascii_lines(on_screen, rendered[index]))
+                out.flush()
+                on_screen = rendered[index]
+
+                next_frame += delay
+                now = time.monotonic()
+                if next_frame < now - delay:
+                    next_frame = now  # fell behind (e.g. terminal stalled): don't burst to catch up
+                if wait_for_key(next_frame - now):
                     read_key()
                     raise KeyboardInterrupt
     except KeyboardInterrupt:
+        out.write(f"\033[{len(on_screen) + 1};1H")
         print("\nAnimation stopped.")
     finally:
+        out.write("\033[?25h")
+        out.flush()
         if platform.system() != "Windows":
             termios.tcsetattr(fd, termios.TCSADRAIN, old_settings)
 
@@ -246,6 +503,15 @@ def reverse_bits(byte):
     byte = (byte & 0xAA) >> 1 | (byte & 0x55) << 1
     return byte
 
+
+# Lookup tables built once at import, indexed by byte value (0-255).
+# REVERSED_BYTES doubles as a bytes.translate() table for mirroring whole rows.
+REVERSED_BYTES = bytes(reverse_bits(b) for b in range(256))
+# Eight greyscale pixels (0 = off, 255 = on), most significant bit first.
+BYTE_TO_PIXELS = [bytes(255 if b & (0x80 >> bit) else 0 for bit in range(8)) for b in range(256)]
+# Eight ASCII preview characters, most significant bit first.
+BYTE_TO_GLYPHS = ["".join("█" if b & (0x80 >> bit) else " " for bit in range(8)) for b in range(256)]
+
 def mirror_sprite_bytes(sprite_bytes, bytes_per_row, mirror_align):
     """
     Mirror the sprite horizontally either in-place (bitwise mirror per byte).
@@ -263,264 +529,3431 @@ def mirror_sprite_bytes(sprite_bytes, bytes_per_row, mirror_align):
     mirrored = []
     for i in range(0, len(sprite_bytes), bytes_per_row):
         row = sprite_bytes[i:i+bytes_per_row]
-        flipped = [reverse_bits(b) for b in row]
+        flipped = list(bytes(row).translate(REVERSED_BYTES))
         if mirror_align:
             flipped = flipped[::-1]
         mirrored.extend(flipped)
     return mirrored
 
-def convert_png_to_zx_defb_pypng(
-    png_file,
-    exclude_colour="#000000",
-    sprite_width=10,
-    sprite_height=16,
-    gap_x=0,
-    gap_y=0,
-    offset_x=0,
-    offset_y=0,
-    use_hex=False,
-    use_bin=False,
-    use_labels=False,
-    alpha_threshold=254,
-    preview_ascii=False,
-    exclude_tolerance=8,
-    inverse=False,
-    mirror=False,
-    mirror_align=False,
-    flip_vertical=False
-):
+
+class StageStats:
     """
-    Convert a PNG sprite sheet to ZX Spectrum DEFB output with options for inversion, mirroring and preview.
+    Per-stage wall time, call count and peak traced memory for --stats.
+
+    Stages must not nest: each ``stage()`` block resets the tracemalloc peak so
+    the recorded peak is the extra memory allocated inside that block.
+    """
+
+    def __init__(self, track_memory=True):
+        self.stages = {}      # name -> [seconds, calls, peak bytes]
+        self.counters = {}
+        self.peak = 0
+        self.track_memory = track_memory
+        self.started = time.perf_counter()
+        if track_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        """Time the enclosed block under ``name``."""
+        if self.track_memory:
+            base = tracemalloc.get_traced_memory()[0]
+            if hasattr(tracemalloc, "reset_peak"):  # Python 3.9+
+                tracemalloc.reset_peak()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            entry = self.stages.setdefault(name, [0.0, 0, 0])
+            entry[0] += time.perf_counter() - start
+            entry[1] += 1
+            if self.track_memory:
+                peak = tracemalloc.get_traced_memory()[1]
+                entry[2] = max(entry[2], peak - base)
+                self.peak = max(self.peak, peak)
+
+    def count(self, name, amount=1):
+        """Add ``amount`` to the counter ``name`` (pixels, sprites, bytes...)."""
+        self.counters[name] = self.counters.get(name, 0) + amount
+
+    def summary(self):
+        """
+        Return the collected numbers as a JSON-friendly dict.
+
+        Returns:
+            dict: Total time, peak memory, counters, throughput and per-stage figures.
+        """
+        total = time.perf_counter() - self.started
+        throughput = {
+            f"{name}_per_second": round(value / total, 1) if total else 0.0
+            for name, value in self.counters.items()
+        }
+        return {
+            "total_seconds": round(total, 6),
+            "peak_memory_bytes": self.peak if self.track_memory else None,
+            "counters": dict(self.counters),
+            "throughput": throughput,
+            "stages": {
+                name: {"seconds": round(seconds, 6), "calls": calls, "peak_memory_bytes": peak}
+                for name, (seconds, calls, peak) in self.stages.items()
+            },
+        }
+
+    def print_table(self, file=None):
+        """Print a human-readable stage table (to stderr by default)."""
+        file = file or sys.stderr
+        summary = self.summary()
+        total = summary["total_seconds"]
+        print(f"\n{'Stage':<16}{'Seconds':>10}{'%':>7}{'Calls':>9}{'Peak KB':>11}", file=file)
+        for name, stage in summary["stages"].items():
+            share = 100 * stage["seconds"] / total if total else 0
+            peak = f"{stage['peak_memory_bytes'] / 1024:.1f}" if self.track_memory else "-"
+            print(f"{name:<16}{stage['seconds']:>10.4f}{share:>6.1f}%{stage['calls']:>9}{peak:>11}", file=file)
+        print(f"{'total':<16}{total:>10.4f}", file=file)
+        for name, value in summary["counters"].items():
+            print(f"{name}: {value} ({summary['throughput'][name + '_per_second']:.0f}/s)", file=file)
+        if self.track_memory:
+            print(f"peak traced memory: {self.peak / (1024 * 1024):.2f} MB", file=file)
+
+
+def stage_timer(stats):
+    """Return ``stats.stage``, or a no-op replacement when stats are not collected."""
+    if stats is None:
+        return lambda name: contextlib.nullcontext()
+    return stats.stage
+
+
+def open_png_reader(png_file):
+    """
+    Open a PNG from a path or from the file's bytes.
 
     Args:
-        png_file (str): Path to the input PNG file.
-        exclude_colour (str): Colour in hex to treat as background.
+        png_file (str or bytes): Path to the PNG, or its contents.
+
+    Returns:
+        png.Reader: Reader for the image.
+    """
+    if isinstance(png_file, (bytes, bytearray, memoryview)):
+        return png.Reader(bytes=bytes(png_file))
+    return png.Reader(png_file)
+
+
+class DecodedImageCache:
+    """
+    LRU cache of decoded PNG rows, for processes that convert the same sheets repeatedly.
+
+    Paths are keyed by (path, mtime, size), so an edited file is decoded again;
+    PNG bytes are keyed by their SHA-256. Entries are evicted oldest-first once
+    the decoded rows exceed ``max_bytes``.
+    """
+
+    def __init__(self, max_bytes=DEFAULT_IMAGE_CACHE_MB * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.entries = collections.OrderedDict()  # key -> (width, height, rows, meta, size)
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(png_file):
+        if isinstance(png_file, (bytes, bytearray, memoryview)):
+            return ("sha256", hashlib.sha256(png_file).hexdigest())
+        st = os.stat(png_file)
+        return ("file", os.path.abspath(png_file), st.st_mtime_ns, st.st_size)
+
+    def read(self, png_file):
+        """
+        Return the decoded image, decoding it on a miss.
+
+        Args:
+            png_file (str or bytes): Path to the PNG, or its contents.
+
+        Returns:
+            tuple: (width, height, list of rows, meta), as ``png.Reader.read()``
+            but with the rows already decoded.
+        """
+        key = self.key(png_file)
+        entry = self.entries.get(key)
+        if entry is not None:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[:4]
+
+        self.misses += 1
+        width, height, pixels, meta = open_png_reader(png_file).read()
+        rows = list(pixels)
+        size = sum(len(row) for row in rows) * (2 if meta["bitdepth"] > 8 else 1)
+        self.entries[key] = (width, height, rows, meta, size)
+        self.size += size
+        while self.size > self.max_bytes and len(self.entries) > 1:
+            _, evicted = self.entries.popitem(last=False)
+            self.size -= evicted[4]
+        return width, height, rows, meta
+
+
+def sprite_grid(width, height, sprite_width, sprite_height, gap_x=0, gap_y=0, offset_x=0, offset_y=0):
+    """
+    Work out the top-left pixel position of every sprite cell on a sheet.
+
+    Args:
+        width (int): Width of the sprite sheet in pixels.
+        height (int): Height of the sprite sheet in pixels.
         sprite_width (int): Width of each sprite in pixels.
         sprite_height (int): Height of each sprite in pixels.
         gap_x (int): Horizontal gap between sprites in pixels.
         gap_y (int): Vertical gap between sprites in pixels.
         offset_x (int): Horizontal offset in pixels.
         offset_y (int): Vertical offset in pixels.
-        use_hex (bool): Output DEFB values in hexadecimal format.
-        use_bin (bool): Output DEFB values in binary format.
-        use_labels (bool): Add sprite labels in the output.
-        alpha_threshold (int): Ignore pixels below this alpha threshold.
-        preview_ascii (bool): Include ASCII preview in output.
-        exclude_tolerance (int): Colour match tolerance.
-        inverse (bool): Invert logic to encode the exclude colour instead.
-        mirror (bool): Mirror sprites horizontally.
-        mirror_align (bool): Also align mirrored sprite bytes.
-        flip_vertical (bool): Flip the sprite vertically.
 
     Returns:
-        tuple: Assembler output string, raw binary output, optional ASCII block list.
+        tuple: (list of x positions, list of y positions) of cells that fit in the image.
     """
-    exclude_rgb = tuple(int(exclude_colour[i:i+2], 16) for i in (1, 3, 5))
-    reader = png.Reader(png_file)
-    width, height, pixels, meta = reader.read()
-    pixel_rows = list(pixels)
-    channels = 4 if meta.get('alpha', False) else 3
-
-    def get_pixel(x, y):
-        row = pixel_rows[y]
-        start = x * channels
-        return tuple(row[start:start + channels])
-
-    def colour_close(a, b, tolerance=8):
-        return all(abs(a[i] - b[i]) <= tolerance for i in range(3))
-
-    defb_output = []
-    binary_output = bytearray()
-    sprite_index = 0
-
-    all_ascii_blocks = []  # <- NEW
-
     full_width = sprite_width + gap_x
     full_height = sprite_height + gap_y
-    bytes_per_row = math.ceil(sprite_width / 8)
 
     max_x = width - ((width - offset_x) % full_width)
     max_y = height - ((height - offset_y) % full_height)
 
-    for y_sprite_index, y_sprite in enumerate(range(offset_y, max_y, full_height)):
-        if y_sprite + sprite_height > height:
-            break
-        for x_sprite_index, x_sprite in enumerate(range(offset_x, max_x, full_width)):
-            if x_sprite + sprite_width > width:
-                break
-
-            defb_output.append(f"; Sprite {sprite_index} ; (X={x_sprite_index}, Y={y_sprite_index})")
-            if use_labels:
-                defb_output.append(f"sprite_{x_sprite_index}_{y_sprite_index}:")
+    # Positions only ever increase, so filtering matches the old "break" behaviour.
+    xs = [x for x in range(offset_x, max_x, full_width) if x + sprite_width <= width]
+    ys = [y for y in range(offset_y, max_y, full_height) if y + sprite_height <= height]
+    return xs, ys
 
-            sprite_rows = []
-            ascii_lines = []
 
-            for y in range(sprite_height):
-                row_bytes = []
-                ascii_row = ""
-                for byte_index in range(bytes_per_row):
-                    byte_val = 0
-                    visual_bits = []
-                    for bit in range(8):
-                        pixel_x = x_sprite + byte_index * 8 + bit
+def parse_index_ranges(text):
+    """
+    Parse a list of sprite indexes such as ``"0-3,7,9-10"``.
 
-                        if pixel_x >= x_sprite + sprite_width:
-                            if inverse:
-                                byte_val |= 1 << (7 - bit)
-                                visual_bits.append("█")
-                            else:
-                                visual_bits.append(" ")
-                            continue
-
-                        pixel = get_pixel(pixel_x, y_sprite + y)
-                        r, g, b = pixel[:3]
-                        alpha_ok = True
-                        if channels == 4:
-                            alpha_ok = pixel[3] >= alpha_threshold
-
-                        match = colour_close((r, g, b), exclude_rgb, exclude_tolerance)
-                        pixel_on = (match if inverse else not match) and alpha_ok
-
-                        if pixel_on:
-                            byte_val |= 1 << (7 - bit)
-                            visual_bits.append("█")
-                        else:
-                            visual_bits.append(" ")
-
-                    row_bytes.append(byte_val)
-                    ascii_row += "".join(visual_bits)
-                sprite_rows.append(row_bytes)
-                ascii_lines.append(ascii_row)
-                
-            if flip_vertical:
-                sprite_rows = flip_sprite_vertically(sprite_rows)
-                ascii_lines = ascii_lines[::-1]
+    Args:
+        text (str): Comma-separated indexes and inclusive ``a-b`` ranges.
 
-            flat_bytes = [b for row in sprite_rows for b in row]
+    Returns:
+        list of int: Sorted, de-duplicated indexes.
 
-            if mirror:
-                flat_bytes = mirror_sprite_bytes(flat_bytes, bytes_per_row, mirror_align)
-                if mirror_align:
-                    ascii_lines = [line[::-1] for line in ascii_lines]
-                else:
-                    ascii_lines = [
-                        ''.join(
-                            ''.join(line[j:j+8][::-1]) for j in range(0, len(line), 8)
-                        )
-                        for line in ascii_lines
-                    ]
-            
-            if preview_ascii:
-                    all_ascii_blocks.append(ascii_lines)
-
-            binary_output.extend(flat_bytes)
-
-            for i in range(0, len(flat_bytes), 8):
-                chunk = flat_bytes[i:i+8]
-                if use_bin:
-                    formatted = ", ".join(f"%{b:08b}" for b in chunk)
-                elif use_hex:
-                    formatted = ", ".join(f"${b:02X}" for b in chunk)
-                else:
-                    formatted = ", ".join(str(b) for b in chunk)
-                defb_output.append("    DEFB " + formatted)
+    Raises:
+        argparse.ArgumentTypeError: If the text is not a valid list.
+    """
+    indexes = set()
+    for part in text.replace(" ", "").split(","):
+        try:
+            first, _, last = part.partition("-")
+            first, last = int(first), int(last or first)
+        except ValueError:
+            raise argparse.ArgumentTypeError(f"invalid index or range '{part}' (expected e.g. 0-3,7)") from None
+        if first < 0 or last < first:
+            raise argparse.ArgumentTypeError(f"invalid index or range '{part}'")
+        indexes.update(range(first, last + 1))
+    return sorted(indexes)
 
-            if preview_ascii:
-                defb_output.append("    ; ASCII Preview:")
-                for line in ascii_lines:
-                    defb_output.append("    ; " + line)
 
-            defb_output.append("")
-            sprite_index += 1
+def parse_cell_ranges(text):
+    """
+    Parse a list of sprite cells such as ``"0:0,2-5:1"`` (X:Y, either side may be a range).
 
-    #return "\n".join(defb_output), bytes(binary_output)
-    return "\n".join(defb_output), bytes(binary_output), all_ascii_blocks
+    Args:
+        text (str): Comma-separated ``X:Y`` entries.
 
+    Returns:
+        list of tuple: Sorted (x_sprite_index, y_sprite_index) pairs.
 
-def main():
+    Raises:
+        argparse.ArgumentTypeError: If the text is not a valid list.
     """
-    Entry point for the ZX Spectrum sprite tool.
+    cells = set()
+    for part in text.replace(" ", "").split(","):
+        x_part, colon, y_part = part.partition(":")
+        if not colon:
+            raise argparse.ArgumentTypeError(f"invalid cell '{part}' (expected X:Y, e.g. 2:0 or 0-3:1)")
+        cells.update(itertools.product(parse_index_ranges(x_part), parse_index_ranges(y_part)))
+    return sorted(cells)
 
-    Parses command-line arguments and executes the appropriate rendering logic.
+
+def parse_animations(text):
     """
-    parser = argparse.ArgumentParser(
-        description="Convert a PNG sprite sheet into ZX Spectrum DEFB statements."
-    )
-    parser.add_argument("filename", nargs='?', default=None, help="Path to input PNG file")
-    parser.add_argument("--sprite_width", type=int, default=8, help="Width of each sprite in pixels")
-    parser.add_argument("--sprite_height", type=int, default=8, help="Height of each sprite in pixels")
-    parser.add_argument("--gap_x", type=int, default=0, help="Horizontal gap between sprites (default: 0)")
-    parser.add_argument("--gap_y", type=int, default=0, help="Vertical gap between sprites (default: 0)")
-    parser.add_argument("--offset_x", type=int, default=0, help="Horizontal offset in pixels (default: 0)")
-    parser.add_argument("--offset_y", type=int, default=0, help="Vertical offset in pixels (default: 0)")
-    parser.add_argument("--exclude_colour", default="#000000", help="Exclude/background colour in hex (default: #000000)")
-    parser.add_argument("--exclude_tolerance", type=int, default=8, help="Tolerance when matching exclude colour")
-    parser.add_argument("--alpha_threshold", type=int, default=254, help="Ignore pixels with alpha below this value (default: 254)")
-    parser.add_argument("--hex", action="store_true", help="Output DEFB values in hexadecimal")
-    parser.add_argument("--bin", action="store_true", help="Output DEFB values in binary format")
-    parser.add_argument("--labels", action="store_true", help="Add sprite_X_Y: label above each sprite")
-    parser.add_argument("--binfile", help="Output raw binary sprite data to .bin file")
-    parser.add_argument("--preview", action="store_true", help="Print ASCII preview of each sprite to terminal")
-    parser.add_argument("--inverse", action="store_true", help="Invert logic: treat exclude colour as pixel to encode")
-    parser.add_argument("--mirror", action="store_true", help="Mirror sprites horizontally")
-    parser.add_argument("--mirror-align", action="store_true", help="Right-align mirrored sprite by reversing byte order")
-    parser.add_argument("--flip-vertical", action="store_true", help="Flip sprite vertically (top-to-bottom)")
-    parser.add_argument("--animate", action="store_true", help="Animate ASCII preview of each sprite")
-    parser.add_argument("--delay", type=float, default=0.2, help="Delay in seconds between frames (default: 0.2)")
-    parser.add_argument("--sprite_data", help="Path to .BIN file containing ZX Spectrum sprite data")
-    parser.add_argument("--bin_output_png", help="Filename to write rendered PNG output from .BIN file")
-    parser.add_argument("--max_texture_width", type=int, default=0, help="Filename to write rendered PNG output from .BIN file")
-    parser.add_argument("-o", "--output", help="Output filename for DEFB listing (stdout if not specified)")
+    Parse an ``--anim-delta`` value: ``rows`` or ``/``-separated cell lists.
 
-    args = parser.parse_args()
+    Args:
+        text (str): "rows" (every sprite row is an animation), or one or more
+            ``parse_cell_ranges`` lists separated by "/", e.g. ``0-7:2/0-3:4``.
 
-    # If BIN File, then PNG File is not required...
-    # Another cludge but will work for now.. 
+    Returns:
+        str or list: "rows", or a list of (x, y) cell lists, one per animation.
 
-    if not args.sprite_data:
-        if not os.path.isfile(args.filename):
-            print(f"❌ Error: File not found - '{args.filename}'")
-            sys.exit(1)
+    Raises:
+        argparse.ArgumentTypeError: If a cell list is not valid.
+    """
+    if text == "rows":
+        return "rows"
+    return [parse_cell_ranges(part) for part in text.split("/")]
 
-        if not args.filename.lower().endswith(".png"):
-            print(f"⚠️ Warning: '{args.filename}' does not appear to be a .png file.")
 
-    if args.mirror_align:
-        args.mirror = True
+def parse_emit(text):
+    """
+    Parse an ``--emit`` value such as ``h`` or ``asm_hex=debug.asm``.
 
-    # It's a cludge for now...
-    if args.animate:
-        args.preview = True
+    Args:
+        text (str): A key of ``OUTPUT_FORMATS``, optionally followed by ``=PATH``.
 
-    if args.mirror:
-        args.mirror_align = True
-        #args.mirror = False
+    Returns:
+        tuple: (format, path or None for the default name).
 
-    if args.sprite_data:
+    Raises:
+        argparse.ArgumentTypeError: If the format is not known.
+    """
+    fmt, _, path = text.partition("=")
+    if fmt not in OUTPUT_FORMATS:
+        raise argparse.ArgumentTypeError(f"unknown format '{fmt}' (choose from {', '.join(OUTPUT_FORMATS)})")
+    return fmt, path or None
+
+
+def select_cells(columns, rows, row_indexes=None, col_indexes=None, cells=None):
+    """
+    Work out which sprite cells of the grid to convert.
+
+    ``row_indexes`` / ``col_indexes`` select whole rows and columns (both given
+    means their intersection); ``cells`` adds individual cells. Indexes past
+    the edge of the grid are ignored.
+
+    Args:
+        columns (int): Sprite columns on the sheet.
+        rows (int): Sprite rows on the sheet.
+        row_indexes (list of int, optional): Selected sprite rows.
+        col_indexes (list of int, optional): Selected sprite columns.
+        cells (list of tuple, optional): Selected (x, y) cells.
+
+    Returns:
+        list of tuple: (y_sprite_index, [x_sprite_index, ...]) in sheet order,
+        or None when no selector is given (every cell).
+
+    Raises:
+        ValueError: If the selectors match no cell on the sheet.
+    """
+    if not (row_indexes or col_indexes or cells):
+        return None
+
+    selected = collections.defaultdict(set)
+    if row_indexes or col_indexes:
+        for y in row_indexes or range(rows):
+            if y < rows:
+                selected[y].update(x for x in (col_indexes or range(columns)) if x < columns)
+    for x, y in cells or ():
+        if x < columns and y < rows:
+            selected[y].add(x)
+
+    selection = [(y, sorted(selected[y])) for y in sorted(selected) if selected[y]]
+    if not selection:
+        raise ValueError(f"No sprite cells selected (the sheet has {columns} columns x {rows} rows)")
+    return selection
+
+
+def iter_row_bands(pixels, ys, sprite_height, stats=None):
+    """
+    Pull pixel rows lazily from a PNG reader and group them into sprite bands.
+
+    Only the ``sprite_height`` rows belonging to the current band are held in
+    memory; offset and gap rows are read and thrown away, and nothing past the
+    last band is decoded.
+
+    Args:
+        pixels (iterable): Row iterator as returned by ``png.Reader.read()``.
+        ys (list of int): Top pixel row of each band (see ``sprite_grid``).
+        sprite_height (int): Height of each sprite in pixels.
+        stats (StageStats, optional): Records time spent decoding under "decode".
+
+    Yields:
+        tuple: (y_sprite_index, list of rows) for each band.
+    """
+    stage = stage_timer(stats)
+    rows = iter(pixels)
+    next_row = 0
+    for y_sprite_index, y_sprite in enumerate(ys):
+        with stage("decode"):
+            for _ in range(y_sprite - next_row):
+                next(rows)
+            band = list(itertools.islice(rows, sprite_height))
+        next_row = y_sprite + sprite_height
+        yield y_sprite_index, band
+
+
+def _transform_sprite(sprite_rows, ascii_lines, bytes_per_row, mirror, mirror_align, flip_vertical):
+    """
+    Apply the flip/mirror options to one packed sprite and its preview lines.
+
+    Args:
+        sprite_rows (list of list of int): Packed bytes, one list per row.
+        ascii_lines (list of str): ASCII preview lines.
+        bytes_per_row (int): Number of bytes per row.
+        mirror (bool): Mirror horizontally.
+        mirror_align (bool): Also reverse the byte order of each row.
+        flip_vertical (bool): Flip top-to-bottom.
+
+    Returns:
+        tuple: (flat_bytes, ascii_lines).
+    """
+    if flip_vertical:
+        sprite_rows = flip_sprite_vertically(sprite_rows)
+        ascii_lines = ascii_lines[::-1]
+
+    flat_bytes = [b for row in sprite_rows for b in row]
+
+    if mirror:
+        flat_bytes = mirror_sprite_bytes(flat_bytes, bytes_per_row, mirror_align)
+        if mirror_align:
+            ascii_lines = [line[::-1] for line in ascii_lines]
+        else:
+            ascii_lines = [
+                ''.join(
+                    ''.join(line[j:j+8][::-1]) for j in range(0, len(line), 8)
+                )
+                for line in ascii_lines
+            ]
+    return flat_bytes, ascii_lines
+
+
+def pixel_lookup_tables(meta, exclude_rgb, exclude_tolerance=8, alpha_threshold=254, inverse=False):
+    """
+    Classify every possible sample value of a palette or greyscale PNG once.
+
+    Palette entries (with their tRNS alpha) and grey levels (scaled to 8 bits)
+    are matched against the exclude colour exactly as RGB pixels are, giving an
+    on/off table indexed by the pixel's sample value.
+
+    Args:
+        meta (dict): PNG metadata as returned by ``png.Reader.read()``.
+        exclude_rgb (tuple): Exclude colour as (r, g, b).
+        exclude_tolerance (int): Colour match tolerance.
+        alpha_threshold (int): Pixels with alpha below this are off.
+        inverse (bool): Encode the exclude colour instead.
+
+    Returns:
+        tuple: (table, alpha_table) lists of 0/1 indexed by sample value, where
+        alpha_table is None unless the image has an alpha plane; or None for
+        RGB/RGBA images.
+    """
+    def classify(rgb, alpha=None):
+        match = all(abs(rgb[i] - exclude_rgb[i]) <= exclude_tolerance for i in range(3))
+        pixel_on = match if inverse else not match
+        return int(pixel_on and (alpha is None or alpha >= alpha_threshold))
+
+    levels = 1 << meta["bitdepth"]
+    if meta.get("palette"):
+        table = [classify(entry[:3], entry[3] if len(entry) == 4 else None) for entry in meta["palette"]]
+        return table + [0] * (levels - len(table)), None
+    if not meta.get("greyscale"):
+        return None
+
+    scale = 255 / (levels - 1)
+    table = [classify((round(v * scale),) * 3) for v in range(levels)]
+    if meta.get("transparent") is not None:
+        transparent = meta["transparent"]
+        transparent = transparent[0] if isinstance(transparent, tuple) else transparent
+        if 0 < alpha_threshold and transparent < levels:
+            table[transparent] = 0
+    alpha_table = None
+    if meta.get("alpha"):
+        alpha_table = [int(round(a * scale) >= alpha_threshold) for a in range(levels)]
+    return table, alpha_table
+
+
+# 0/1 samples -> ASCII "0"/"1" digits, so a row of bits parses with int(bits, 2).
+BIT_DIGITS = bytes.maketrans(b"\x00\x01", b"01")
+
+
+def _pack_sprites_indexed(
+    bands, planes, bitdepth, xs, sprite_width, sprite_height, table, alpha_table,
+    inverse, mirror, mirror_align, flip_vertical, stats=None
+):
+    """
+    Pack palette/greyscale sprite cells through a per-sample lookup table (pure Python).
+
+    Each cell row is classified with one ``bytes.translate`` over its sample
+    values and packed with a single ``int(..., 2)``, instead of matching every
+    pixel's colour. Produces the same bytes as ``_pack_sprites_python`` on the
+    equivalent RGB image.
+
+    Args:
+        bands (iterable): (y_sprite_index, rows) pairs from ``iter_row_bands``.
+        planes (int): Samples per pixel (1, or 2 with alpha).
+        bitdepth (int): Bits per sample.
+        table, alpha_table (list): From ``pixel_lookup_tables``.
+        stats (StageStats, optional): Records "classify+pack" and "transform" times.
+
+    Yields:
+        tuple: (x_sprite_index, y_sprite_index, flat_bytes, ascii_lines) per sprite.
+    """
+    bytes_per_row = math.ceil(sprite_width / 8)
+    padding = (b"\x01" if inverse else b"\x00") * (bytes_per_row * 8 - sprite_width)
+    stage = stage_timer(stats)
+
+    if bitdepth <= 8:
+        # bytes.translate needs a full 256-entry table, even for 1/2/4-bit samples.
+        on_table = bytes(table).ljust(256, b"\x00")
+        alpha_on_table = alpha_table and bytes(alpha_table).ljust(256, b"\x00")
+
+        def lookup(samples, lut):
+            return bytes(samples).translate(lut)
+    else:
+        on_table, alpha_on_table = table, alpha_table
+
+        def lookup(samples, lut):
+            return bytes([lut[v] for v in samples])
+
+    for y_sprite_index, band in bands:
+        for x_sprite_index, x_sprite in enumerate(xs):
+            with stage("classify+pack"):
+                start, end = x_sprite * planes, (x_sprite + sprite_width) * planes
+                sprite_rows = []
+                ascii_lines = []
+                for row in band:
+                    samples = row[start:end]
+                    bits = lookup(samples[::planes], on_table)
+                    if alpha_on_table:
+                        bits = bytes(map(int.__and__, bits, lookup(samples[1::planes], alpha_on_table)))
+                    row_bytes = list(int((bits + padding).translate(BIT_DIGITS), 2).to_bytes(bytes_per_row, "big"))
+                    sprite_rows.append(row_bytes)
+                    ascii_lines.append("".join([BYTE_TO_GLYPHS[b] for b in row_bytes]))
+
+            with stage("transform"):
+                flat_bytes, ascii_lines = _transform_sprite(
+                    sprite_rows, ascii_lines, bytes_per_row, mirror, mirror_align, flip_vertical
+                )
+
+            yield x_sprite_index, y_sprite_index, flat_bytes, ascii_lines
+
+
+def _pack_sprites_python(
+    bands, channels, xs, sprite_width, sprite_height, exclude_rgb,
+    exclude_tolerance, alpha_threshold, inverse, mirror, mirror_align, flip_vertical, stats=None
+):
+    """
+    Pack every sprite cell one pixel at a time (pure-Python reference path).
+
+    Args:
+        bands (iterable): (y_sprite_index, rows) pairs from ``iter_row_bands``.
+        stats (StageStats, optional): Records "classify+pack" and "transform" times.
+
+    Yields:
+        tuple: (x_sprite_index, y_sprite_index, flat_bytes, ascii_lines) per sprite.
+    """
+    def get_pixel(band, x, y):
+        row = band[y]
+        start = x * channels
+        return tuple(row[start:start + channels])
+
+    def colour_close(a, b, tolerance=8):
+        return all(abs(a[i] - b[i]) <= tolerance for i in range(3))
+
+    bytes_per_row = math.ceil(sprite_width / 8)
+    stage = stage_timer(stats)
+
+    for y_sprite_index, band in bands:
+        for x_sprite_index, x_sprite in enumerate(xs):
+            with stage("classify+pack"):
+                sprite_rows = []
+                ascii_lines = []
+
+                for y in range(sprite_height):
+                    row_bytes = []
+                    ascii_row = ""
+                    for byte_index in range(bytes_per_row):
+                        byte_val = 0
+                        visual_bits = []
+                        for bit in range(8):
+                            pixel_x = x_sprite + byte_index * 8 + bit
+
+                            if pixel_x >= x_sprite + sprite_width:
+                                if inverse:
+                                    byte_val |= 1 << (7 - bit)
+                                    visual_bits.append("█")
+                                else:
+                                    visual_bits.append(" ")
+                                continue
+
+                            pixel = get_pixel(band, pixel_x, y)
+                            r, g, b = pixel[:3]
+                            alpha_ok = True
+                            if channels == 4:
+                                alpha_ok = pixel[3] >= alpha_threshold
+
+                            match = colour_close((r, g, b), exclude_rgb, exclude_tolerance)
+                            pixel_on = (match if inverse else not match) and alpha_ok
+
+                            if pixel_on:
+                                byte_val |= 1 << (7 - bit)
+                                visual_bits.append("█")
+                            else:
+                                visual_bits.append(" ")
+
+                        row_bytes.append(byte_val)
+                        ascii_row += "".join(visual_bits)
+                    sprite_rows.append(row_bytes)
+                    ascii_lines.append(ascii_row)
+
+            with stage("transform"):
+                flat_bytes, ascii_lines = _transform_sprite(
+                    sprite_rows, ascii_lines, bytes_per_row, mirror, mirror_align, flip_vertical
+                )
+
+            yield x_sprite_index, y_sprite_index, flat_bytes, ascii_lines
+
+
+def _pack_sprites_numpy(
+    bands, width, channels, xs, sprite_width, sprite_height, exclude_rgb,
+    exclude_tolerance, alpha_threshold, inverse, mirror, mirror_align, flip_vertical,
+    want_ascii=True, lookup=None, stats=None
+):
+    """
+    Pack every sprite cell with NumPy array operations.
+
+    Each band is classified in one go (exclude colour + alpha, or a single
+    table index per pixel for palette/greyscale images), cut into cells
+    with a single fancy index, transformed with array slicing and packed with
+    ``np.packbits``. Produces exactly the same bytes as ``_pack_sprites_python``.
+
+    Args:
+        bands (iterable): (y_sprite_index, rows) pairs from ``iter_row_bands``.
+        lookup (tuple, optional): (table, alpha_table) from ``pixel_lookup_tables``;
+            ``channels`` is then the number of samples per pixel.
+        stats (StageStats, optional): Records "classify", "transform", "pack" and "preview" times.
+
+    Yields:
+        tuple: (x_sprite_index, y_sprite_index, flat_bytes, ascii_lines) per sprite.
+    """
+    if not xs:
+        return
+
+    bytes_per_row = math.ceil(sprite_width / 8)
+    padded_width = bytes_per_row * 8
+    cells_x = len(xs)
+    col_index = (np.array(xs)[:, None] + np.arange(sprite_width)).ravel()
+    exclude = np.array(exclude_rgb)
+    if lookup is not None:
+        on_table = np.array(lookup[0], dtype=bool)
+        alpha_on_table = np.array(lookup[1], dtype=bool) if lookup[1] is not None else None
+    stage = stage_timer(stats)
+
+    for y_sprite_index, band in bands:
+        with stage("classify"):
+            image = np.stack([np.asarray(row) for row in band]).reshape(sprite_height, width, channels)
+            if lookup is not None:
+                pixel_on = on_table[image[:, :, 0]]
+                if alpha_on_table is not None:
+                    pixel_on &= alpha_on_table[image[:, :, 1]]
+            else:
+                image = image.astype(np.int32)
+                match = np.all(np.abs(image[:, :, :3] - exclude) <= exclude_tolerance, axis=2)
+                pixel_on = match if inverse else ~match
+                if channels == 4:
+                    pixel_on &= image[:, :, 3] >= alpha_threshold
+            del image
+
+        with stage("transform"):
+            cells = pixel_on[:, col_index].reshape(sprite_height, cells_x, sprite_width).transpose(1, 0, 2)
+
+            # Bits beyond the sprite width are set when inverse, as in the Python path.
+            if padded_width > sprite_width:
+                cells = np.pad(cells, ((0, 0), (0, 0), (0, padded_width - sprite_width)), constant_values=inverse)
+
+            if flip_vertical:
+                cells = cells[:, ::-1, :]
+
+            if mirror:
+                if mirror_align:
+                    cells = cells[..., ::-1]
+                else:
+                    cells = cells.reshape(cells_x, sprite_height, bytes_per_row, 8)[..., ::-1]
+                    cells = cells.reshape(cells_x, sprite_height, padded_width)
+
+        with stage("pack"):
+            packed = np.packbits(cells, axis=-1).reshape(cells_x, sprite_height * bytes_per_row).tolist()
+
+        ascii_blocks = [[] for _ in range(cells_x)]
+        if want_ascii:
+            with stage("preview"):
+                ascii_blocks = [
+                    [
+                        "".join([BYTE_TO_GLYPHS[b] for b in flat_bytes[i:i + bytes_per_row]])
+                        for i in range(0, len(flat_bytes), bytes_per_row)
+                    ]
+                    for flat_bytes in packed
+                ]
+
+        for x_sprite_index in range(cells_x):
+            yield x_sprite_index, y_sprite_index, packed[x_sprite_index], ascii_blocks[x_sprite_index]
+
+
+def dedupe_sprites(sprites, bytes_per_row, match_transforms=False, stats=None):
+    """
+    Drop repeated sprites, aliasing each duplicate to the first identical sprite.
+
+    Unique sprites are kept in a dict keyed by their packed bytes, so each
+    sprite costs a handful of hash lookups however large the sheet is. With
+    ``match_transforms`` a sprite that is a horizontal mirror (as produced by
+    ``mirror_sprite_bytes`` with alignment), a vertical flip, or both, of an
+    earlier sprite is aliased too.
+
+    Args:
+        sprites (iterable): (x_sprite_index, y_sprite_index, flat_bytes, ascii_lines) tuples.
+        bytes_per_row (int): Number of bytes per sprite row.
+        match_transforms (bool): Also match mirrored and flipped copies.
+        stats (dict, optional): Filled with sprite counts and bytes saved.
+
+    Yields:
+        tuple: (x_sprite_index, y_sprite_index, flat_bytes, ascii_lines, alias), where
+        alias is None for unique sprites, or (sprite_index, x_sprite_index,
+        y_sprite_index, transform) of the sprite it duplicates.
+    """
+    def flip(flat_bytes):
+        rows = [flat_bytes[i:i+bytes_per_row] for i in range(0, len(flat_bytes), bytes_per_row)]
+        return [b for row in flip_sprite_vertically(rows) for b in row]
+
+    variants = [("identical", lambda flat_bytes: flat_bytes)]
+    if match_transforms:
+        variants += [
+            ("mirrored", lambda flat_bytes: mirror_sprite_bytes(flat_bytes, bytes_per_row, True)),
+            ("flipped", flip),
+            ("mirrored+flipped", lambda flat_bytes: flip(mirror_sprite_bytes(flat_bytes, bytes_per_row, True))),
+        ]
+
+    unique = {}
+    counts = stats if stats is not None else {}
+    counts.update({"sprites": 0, "unique": 0, "aliased": 0, "bytes_saved": 0})
+    counts.update({name: 0 for name, _ in variants})
+
+    for sprite_index, (x_sprite_index, y_sprite_index, flat_bytes, ascii_lines) in enumerate(sprites):
+        counts["sprites"] += 1
+        alias = None
+        for name, transform in variants:
+            original = unique.get(bytes(transform(flat_bytes)))
+            if original is not None:
+                alias = original + (name,)
+                counts[name] += 1
+                counts["aliased"] += 1
+                counts["bytes_saved"] += len(flat_bytes)
+                break
+        else:
+            unique[bytes(flat_bytes)] = (sprite_index, x_sprite_index, y_sprite_index)
+            counts["unique"] += 1
+
+        yield x_sprite_index, y_sprite_index, flat_bytes, ascii_lines, alias
+
+
+def make_sprite_packer(
+    width, meta, sprite_width, sprite_height, exclude_colour="#000000", exclude_tolerance=8,
+    alpha_threshold=254, inverse=False, mirror=False, mirror_align=False, flip_vertical=False,
+    use_numpy=None, want_ascii=True, stats=None
+):
+    """
+    Pick the packing backend for a decoded sheet and bind the conversion options.
+
+    Args:
+        width (int): Width of the sprite sheet in pixels.
+        meta (dict): PNG metadata as returned by ``png.Reader.read()``.
+        use_numpy (bool, optional): Use the vectorised NumPy backend. None picks it
+            automatically when NumPy is installed.
+        want_ascii (bool): Build ASCII preview lines (the NumPy path skips them otherwise).
+        stats (StageStats, optional): Collects per-stage timings.
+        Remaining arguments are as for ``convert_png_to_zx_defb_pypng``.
+
+    Returns:
+        callable: ``pack(bands, xs)`` yielding (x_sprite_index, y_sprite_index,
+        flat_bytes, ascii_lines) for the cells at x positions ``xs`` of each band.
+    """
+    exclude_rgb = tuple(int(exclude_colour[i:i+2], 16) for i in (1, 3, 5))
+    channels = 4 if meta.get('alpha', False) else 3
+    transforms = (exclude_rgb, exclude_tolerance, alpha_threshold, inverse, mirror, mirror_align, flip_vertical)
+
+    if use_numpy is None:
+        use_numpy = np is not None
+    elif use_numpy and np is None:
+        global _numpy_fallback_warned
+        if not _numpy_fallback_warned:
+            print("⚠️ Warning: NumPy is not installed, using the pure-Python converter.")
+            _numpy_fallback_warned = True
+        use_numpy = False
+
+    # Palette and greyscale sheets classify each possible sample value once.
+    lookup = pixel_lookup_tables(meta, exclude_rgb, exclude_tolerance, alpha_threshold, inverse)
+    if lookup is not None:
+        planes = meta["planes"]
+        if use_numpy:
+            def pack(bands, xs):
+                return _pack_sprites_numpy(
+                    bands, width, planes, xs, sprite_width, sprite_height,
+                    *transforms, want_ascii=want_ascii, lookup=lookup, stats=stats
+                )
+        else:
+            def pack(bands, xs):
+                return _pack_sprites_indexed(
+                    bands, planes, meta["bitdepth"], xs, sprite_width, sprite_height, *lookup,
+                    inverse, mirror, mirror_align, flip_vertical, stats=stats
+                )
+        return pack
+
+    # The vectorised path only understands rows of RGB/RGBA samples.
+    if use_numpy and meta.get('planes') == channels:
+        def pack(bands, xs):
+            return _pack_sprites_numpy(
+                bands, width, channels, xs, sprite_width, sprite_height,
+                *transforms, want_ascii=want_ascii, stats=stats
+            )
+    else:
+        def pack(bands, xs):
+            return _pack_sprites_python(bands, channels, xs, sprite_width, sprite_height, *transforms, stats=stats)
+    return pack
+
+
+# Per-byte number strings, so formatting a byte is a list lookup.
+DEC_STRINGS = [str(b) for b in range(256)]
+HEX_STRINGS = [f"${b:02X}" for b in range(256)]
+BIN_STRINGS = [f"%{b:08b}" for b in range(256)]
+C_HEX_STRINGS = [f"0x{b:02X}" for b in range(256)]
+
+
+def format_defb_lines(flat_bytes, use_hex=False, use_bin=False):
+    """
+    Format bytes as DEFB statements, eight values per line.
+
+    Args:
+        flat_bytes (list of int): Bytes to emit.
+        use_hex (bool): Output DEFB values in hexadecimal format.
+        use_bin (bool): Output DEFB values in binary format.
+
+    Returns:
+        list of str: Indented "DEFB ..." lines.
+    """
+    table = BIN_STRINGS if use_bin else HEX_STRINGS if use_hex else DEC_STRINGS
+    return [
+        "    DEFB " + ", ".join([table[b] for b in flat_bytes[i:i+8]]) for i in range(0, len(flat_bytes), 8)
+    ]
+
+
+def preshift_sprite(flat_bytes, bytes_per_row, shift, inverse=False):
+    """
+    Shift every row of a packed sprite right by ``shift`` pixels.
+
+    Each row is treated as one big-endian integer with an extra byte on the
+    right, so the shifted sprite is one byte wider per row. Vacated bits are
+    cleared, or set when ``inverse`` (matching how padding bits are filled).
+
+    Args:
+        flat_bytes (list of int): Packed sprite bytes.
+        bytes_per_row (int): Number of bytes per row.
+        shift (int): Pixels to shift right (0-7).
+        inverse (bool): Fill vacated bits with 1s.
+
+    Returns:
+        list of int: Shifted sprite, ``bytes_per_row + 1`` bytes per row.
+    """
+    width_bits = (bytes_per_row + 1) * 8
+    fill_byte = b"\xff" if inverse else b"\x00"
+    fill_left = ((1 << shift) - 1) << (width_bits - shift) if inverse else 0
+    shifted = []
+    for i in range(0, len(flat_bytes), bytes_per_row):
+        value = int.from_bytes(bytes(flat_bytes[i:i+bytes_per_row]) + fill_byte, "big")
+        shifted.extend(((value >> shift) | fill_left).to_bytes(bytes_per_row + 1, "big"))
+    return shifted
+
+
+def preshift_offsets(count):
+    """Return the pixel shifts used for ``count`` pre-shifted copies (2, 4 or 8)."""
+    return list(range(0, 8, 8 // count))
+
+
+def sprite_mask(flat_bytes, bytes_per_row, outline=False):
+    """
+    Build the AND-mask for a packed sprite: bits clear where the sprite has ink.
+
+    Args:
+        flat_bytes (list of int): Packed sprite bytes.
+        bytes_per_row (int): Number of bytes per row.
+        outline (bool): Also clear the eight neighbours of every ink pixel, giving
+            a one-pixel border (kept within the row's bytes).
+
+    Returns:
+        list of int: Mask bytes, same layout as ``flat_bytes``.
+    """
+    full = (1 << (bytes_per_row * 8)) - 1
+    rows = [
+        int.from_bytes(bytes(flat_bytes[i:i+bytes_per_row]), "big") for i in range(0, len(flat_bytes), bytes_per_row)
+    ]
+    if outline:
+        wide = [(value | value << 1 | value >> 1) & full for value in rows]
+        rows = [
+            wide[y] | (wide[y - 1] if y > 0 else 0) | (wide[y + 1] if y + 1 < len(wide) else 0)
+            for y in range(len(wide))
+        ]
+    mask = []
+    for value in rows:
+        mask.extend((~value & full).to_bytes(bytes_per_row, "big"))
+    return mask
+
+
+def mask_record(record, bytes_per_row, layout="interleaved", outline=False):
+    """
+    Combine each of a record's blocks with its mask.
+
+    ``interleaved`` stores mask, data, mask, data... byte by byte;
+    ``planes`` stores the data bytes followed by the mask bytes. Pre-shifted
+    copies get a mask built from their own (one byte wider) rows.
+
+    Args:
+        record (SpriteRecord): Unique (non-alias) sprite record.
+        bytes_per_row (int): Bytes per row of the unshifted sprite.
+        layout (str): "interleaved" or "planes".
+        outline (bool): Dilate the mask by one pixel (see ``sprite_mask``).
+
+    Returns:
+        SpriteRecord: Record whose data (and shifts) hold mask and data bytes.
+    """
+    def combine(data, row_bytes):
+        mask = sprite_mask(data, row_bytes, outline)
+        if layout == "planes":
+            return list(data) + mask
+        return [b for pair in zip(mask, data) for b in pair]
+
+    if record.shifts:
+        return record._replace(
+            shifts=[(shift, combine(data, bytes_per_row + 1)) for shift, data in record.shifts]
+        )
+    return record._replace(data=combine(record.data, bytes_per_row))
+
+
+def format_sprite_block(
+    sprite_index, x_sprite_index, y_sprite_index, flat_bytes, ascii_lines, alias=None,
+    use_hex=False, use_bin=False, use_labels=False, preview_ascii=False,
+    shifts=None, shift_table=False, compression=None, mask_layout=None, delta=None
+):
+    """
+    Format one sprite as DEFB listing lines (comment, label, data, preview).
+
+    Args:
+        sprite_index (int): Running sprite number on the sheet.
+        x_sprite_index (int): Column of the sprite on the sheet.
+        y_sprite_index (int): Row of the sprite on the sheet.
+        flat_bytes (list of int): Packed sprite bytes.
+        ascii_lines (list of str): ASCII preview lines.
+        alias (tuple, optional): Duplicate information from ``dedupe_sprites``;
+            aliased sprites get an EQU label and no DEFB data.
+        use_hex (bool): Output DEFB values in hexadecimal format.
+        use_bin (bool): Output DEFB values in binary format.
+        use_labels (bool): Add sprite labels in the output.
+        preview_ascii (bool): Include ASCII preview in output.
+        shifts (list, optional): (shift, bytes) pre-shifted copies emitted in place
+            of ``flat_bytes``, each labelled ``sprite_X_Y_sN``.
+        shift_table (bool): Follow pre-shifted copies with an 8-entry DEFW table
+            mapping pixel shift (x AND 7) to the nearest copy.
+        compression (tuple, optional): (codecs, raw size, compressed size) noted in
+            the sprite comment when the bytes are compressed streams.
+        mask_layout (str, optional): "interleaved" or "planes" when the bytes carry
+            a mask (see ``mask_record``); planes get a ``sprite_X_Y_mask`` label.
+        delta (tuple, optional): (kind, previous X, previous Y, changed bytes, frame size)
+            when the bytes are an XOR delta stream (see ``xor_delta``).
+
+    Returns:
+        list of str: Listing lines, ending with a blank separator line.
+    """
+    lines = []
+    label = f"sprite_{x_sprite_index}_{y_sprite_index}"
+    if alias is None:
+        comment = f"; Sprite {sprite_index} ; (X={x_sprite_index}, Y={y_sprite_index})"
+        if shifts:
+            comment += f" ; pre-shifted x{len(shifts)}"
+        if mask_layout:
+            comment += f" ; {mask_layout} mask"
+        if delta:
+            kind, previous_x, previous_y, changed, frame_size = delta
+            form = "sparse xor delta from" if kind == "sparse" else "keyframe after"
+            comment += f" ; {form} sprite_{previous_x}_{previous_y} ({changed} of {frame_size} bytes changed)"
+        if compression:
+            codecs, raw_size, packed_size = compression
+            comment += f" ; {codecs} {raw_size} -> {packed_size} bytes ({packed_size / raw_size:.0%})"
+        lines.append(comment)
+        if use_labels:
+            lines.append(f"{label}:")
+
+        def add_data(block_label, block_bytes):
+            # Split mask planes with their own label (compressed and delta streams stay whole).
+            if mask_layout == "planes" and not compression and not delta:
+                half = len(block_bytes) // 2
+                lines.extend(format_defb_lines(block_bytes[:half], use_hex, use_bin))
+                lines.append(f"{block_label}_mask:" if use_labels else "    ; Mask")
+                block_bytes = block_bytes[half:]
+            lines.extend(format_defb_lines(block_bytes, use_hex, use_bin))
+
+        if not shifts:
+            add_data(label, flat_bytes)
+        else:
+            for shift, shifted_bytes in shifts:
+                lines.append(f"{label}_s{shift}:" if use_labels else f"    ; Shift {shift}")
+                add_data(f"{label}_s{shift}", shifted_bytes)
+            if shift_table and use_labels:
+                step = 8 // len(shifts)
+                entries = ", ".join(f"{label}_s{(pixel // step) * step}" for pixel in range(8))
+                lines.append(f"{label}_shifts:")
+                lines.append(f"    DEFW {entries}")
+    else:
+        original_index, original_x, original_y, how = alias
+        lines.append(
+            f"; Sprite {sprite_index} ; (X={x_sprite_index}, Y={y_sprite_index}) = Sprite {original_index} ({how})"
+        )
+        if use_labels:
+            lines.append(f"{label} EQU sprite_{original_x}_{original_y}")
+
+    if preview_ascii:
+        lines.append("    ; ASCII Preview:")
+        for line in ascii_lines:
+            lines.append("    ; " + line)
+
+    lines.append("")
+    return lines
+
+
+def dedupe_summary(stats):
+    """
+    Format deduplication statistics as an assembler comment line.
+
+    Args:
+        stats (dict): Counts filled in by ``dedupe_sprites``.
+
+    Returns:
+        str: One-line summary, e.g. "; Dedupe: 16 sprites, 12 unique, ...".
+    """
+    matches = ", ".join(
+        f"{stats[name]} {name}" for name in ("identical", "mirrored", "flipped", "mirrored+flipped") if name in stats
+    )
+    return (
+        f"; Dedupe: {stats['sprites']} sprites, {stats['unique']} unique, "
+        f"{stats['aliased']} aliased ({matches}), {stats['bytes_saved']} bytes saved"
+    )
+
+
+# Compressed stream control bytes, shared by both codecs:
+#   RLE: 0-127 copy the next n+1 bytes, 129-255 repeat the next byte 257-n times, 128 ends the stream.
+#   LZ:  0-127 copy the next n+1 bytes, 129-255 copy n-126 bytes from "offset byte + 1" back, 128 ends.
+STREAM_END = 128
+COMPRESSION_CODECS = ("rle", "lz")
+CODEC_IDS = {"rle": 1, "lz": 2}
+LZ_WINDOW = 256
+LZ_MAX_MATCH = 129
+LZ_CHAIN_LIMIT = 16
+
+
+def _append_literals(out, literals):
+    """Append literal bytes to a compressed stream in runs of up to 128."""
+    for i in range(0, len(literals), 128):
+        chunk = literals[i:i+128]
+        out.append(len(chunk) - 1)
+        out += chunk
+
+
+def rle_compress(data):
+    """
+    Run-length encode bytes (PackBits-style, terminated by ``STREAM_END``).
+
+    Args:
+        data (bytes-like): Raw bytes.
+
+    Returns:
+        bytes: Compressed stream.
+    """
+    out = bytearray()
+    literals = bytearray()
+    for value, group in itertools.groupby(bytes(data)):
+        run = sum(1 for _ in group)
+        # A pair only pays for itself as a run when it doesn't split a literal block.
+        if run >= 3 or (run == 2 and not literals):
+            _append_literals(out, literals)
+            literals.clear()
+            while run >= 2:
+                count = min(run, 128)
+                out += bytes((257 - count, value))
+                run -= count
+        literals += bytes((value,)) * run
+    _append_literals(out, literals)
+    out.append(STREAM_END)
+    return bytes(out)
+
+
+def rle_decompress(stream, pos=0):
+    """
+    Decode one RLE stream.
+
+    Args:
+        stream (bytes-like): Buffer holding the compressed stream.
+        pos (int): Offset of the stream in ``stream``.
+
+    Returns:
+        tuple: (decoded bytes, offset just past the end marker).
+    """
+    out = bytearray()
+    try:
+        while True:
+            control = stream[pos]
+            pos += 1
+            if control < 128:
+                if pos + control + 1 > len(stream):
+                    raise IndexError
+                out += stream[pos:pos + control + 1]
+                pos += control + 1
+            elif control == STREAM_END:
+                return bytes(out), pos
+            else:
+                out += bytes((stream[pos],)) * (257 - control)
+                pos += 1
+    except IndexError:
+        raise ValueError("Truncated RLE stream") from None
+
+
+def lz_compress(data):
+    """
+    Compress bytes with a byte-oriented LZ77 scheme suited to Z80 decoders.
+
+    Matches are 3-129 bytes long and at most 256 bytes back, and may overlap
+    the bytes being written (so an LDIR-style forward copy decodes them).
+    Match search is greedy over a short hash chain of 3-byte prefixes.
+
+    Args:
+        data (bytes-like): Raw bytes.
+
+    Returns:
+        bytes: Compressed stream, terminated by ``STREAM_END``.
+    """
+    data = bytes(data)
+    size = len(data)
+    out = bytearray()
+    chains = {}
+    literal_start = 0
+    i = 0
+    while i < size:
+        best_length, best_offset = 0, 0
+        if i + 3 <= size:
+            key = data[i:i+3]
+            candidates = chains.setdefault(key, [])
+            max_length = min(LZ_MAX_MATCH, size - i)
+            for j in reversed(candidates[-LZ_CHAIN_LIMIT:]):
+                if i - j > LZ_WINDOW:
+                    break
+                length = 3
+                while length < max_length and data[j + length] == data[i + length]:
+                    length += 1
+                if length > best_length:
+                    best_length, best_offset = length, i - j
+                    if length == max_length:
+                        break
+            candidates.append(i)
+
+        if best_length < 3:
+            i += 1
+            continue
+
+        _append_literals(out, data[literal_start:i])
+        out += bytes((best_length + 126, best_offset - 1))
+        for k in range(i + 1, min(i + best_length, size - 2)):
+            chains.setdefault(data[k:k+3], []).append(k)
+        i += best_length
+        literal_start = i
+
+    _append_literals(out, data[literal_start:])
+    out.append(STREAM_END)
+    return bytes(out)
+
+
+def lz_decompress(stream, pos=0):
+    """
+    Decode one LZ stream.
+
+    Args:
+        stream (bytes-like): Buffer holding the compressed stream.
+        pos (int): Offset of the stream in ``stream``.
+
+    Returns:
+        tuple: (decoded bytes, offset just past the end marker).
+    """
+    out = bytearray()
+    try:
+        while True:
+            control = stream[pos]
+            pos += 1
+            if control < 128:
+                if pos + control + 1 > len(stream):
+                    raise IndexError
+                out += stream[pos:pos + control + 1]
+                pos += control + 1
+            elif control == STREAM_END:
+                return bytes(out), pos
+            else:
+                start = len(out) - (stream[pos] + 1)
+                pos += 1
+                if start < 0:
+                    raise ValueError("LZ match offset points before the start of the stream")
+                for k in range(start, start + control - 126):
+                    out.append(out[k])
+    except IndexError:
+        raise ValueError("Truncated LZ stream") from None
+
+
+COMPRESSORS = {"rle": rle_compress, "lz": lz_compress}
+DECOMPRESSORS = {"rle": rle_decompress, "lz": lz_decompress}
+
+
+def compress_sprite(data, codec):
+    """
+    Compress one sprite's bytes.
+
+    With ``codec="auto"`` both codecs are tried and the smaller stream is kept,
+    prefixed with its ``CODEC_IDS`` byte so the decoder knows which one to run.
+
+    Args:
+        data (bytes-like): Packed sprite bytes.
+        codec (str): "rle", "lz" or "auto".
+
+    Returns:
+        tuple: (codec name used, compressed bytes).
+    """
+    if codec != "auto":
+        return codec, COMPRESSORS[codec](data)
+    best = min(((name, COMPRESSORS[name](data)) for name in COMPRESSION_CODECS), key=lambda item: len(item[1]))
+    return best[0], bytes((CODEC_IDS[best[0]],)) + best[1]
+
+
+def decompress_sprite(stream, codec, pos=0):
+    """
+    Decode one sprite stream written by ``compress_sprite``.
+
+    Args:
+        stream (bytes-like): Buffer holding the compressed stream.
+        codec (str): "rle", "lz" or "auto" (codec id byte first).
+        pos (int): Offset of the stream in ``stream``.
+
+    Returns:
+        tuple: (decoded bytes, offset of the next stream).
+    """
+    if codec == "auto":
+        codec_id = stream[pos]
+        names = [name for name, value in CODEC_IDS.items() if value == codec_id]
+        if not names:
+            raise ValueError(f"Unknown codec id {codec_id} at offset {pos}")
+        codec, pos = names[0], pos + 1
+    return DECOMPRESSORS[codec](stream, pos)
+
+
+def decompress_bank(stream, codec):
+    """
+    Decode a compressed .bin: sprite streams stored back to back.
+
+    Args:
+        stream (bytes-like): Contents of the compressed .bin file.
+        codec (str): Codec the bank was written with ("rle", "lz" or "auto").
+
+    Returns:
+        bytes: The uncompressed sprite bank.
+    """
+    out = bytearray()
+    pos = 0
+    while pos < len(stream):
+        data, pos = decompress_sprite(stream, codec, pos)
+        out += data
+    return bytes(out)
+
+
+def compress_record(record, codec, memo, verify=False):
+    """
+    Replace a sprite record's bytes (and pre-shifted copies) with compressed streams.
+
+    Every labelled block is compressed on its own, so each stays independently
+    decodable. Identical blocks are compressed once via ``memo``.
+
+    Args:
+        record (SpriteRecord): Unique (non-alias) sprite record.
+        codec (str): "rle", "lz" or "auto".
+        memo (dict): Raw bytes -> (codec used, stream), shared across a conversion.
+        verify (bool): Decode every new stream and check it against the input.
+
+    Returns:
+        SpriteRecord: Record with compressed data and ``compression`` set to
+        (codecs used, raw size, compressed size).
+    """
+    blocks = record.shifts or [(None, record.data)]
+    packed_blocks, used, raw_size, packed_size = [], [], 0, 0
+    for shift, data in blocks:
+        raw = bytes(data)
+        if raw not in memo:
+            memo[raw] = compress_sprite(raw, codec)
+            if verify and decompress_sprite(memo[raw][1], codec)[0] != raw:
+                raise ValueError(
+                    f"{memo[raw][0]} round trip failed for sprite ({record.x_index}, {record.y_index})"
+                )
+        name, stream = memo[raw]
+        packed_blocks.append((shift, stream))
+        if name not in used:
+            used.append(name)
+        raw_size += len(raw)
+        packed_size += len(stream)
+
+    compression = ("+".join(used), raw_size, packed_size)
+    if record.shifts:
+        return record._replace(shifts=packed_blocks, compression=compression)
+    return record._replace(data=packed_blocks[0][1], compression=compression)
+
+
+def compression_summary(stats):
+    """
+    Format compression statistics as an assembler comment line.
+
+    Args:
+        stats (dict): Totals filled in by ``iter_sprite_records``.
+
+    Returns:
+        str: One-line summary, e.g. "; Compression: lz, 384 -> 201 bytes (52%), ...".
+    """
+    ratio = stats["packed"] / stats["raw"] if stats["raw"] else 1.0
+    codecs = ", ".join(f"{stats[name]} {name}" for name in COMPRESSION_CODECS if stats.get(name))
+    return (
+        f"; Compression: {stats['codec']}, {stats['raw']} -> {stats['packed']} bytes ({ratio:.0%}), "
+        f"{stats['sprites']} sprites ({codecs or 'none'})"
+    )
+
+
+# Delta stream form byte: 0-254 = that many (offset, xor) pairs follow, 255 = a keyframe (the whole frame) follows.
+DELTA_KEY = 255
+DELTA_MAX_SPARSE_FRAME = 256  # sparse offsets are single bytes
+
+
+def xor_delta(previous, current):
+    """
+    Encode the change from one animation frame to the next as an XOR delta.
+
+    The sparse form lists the changed bytes as (offset, previous XOR current)
+    pairs, which the game XORs into its copy of the previous frame (applying
+    the same delta again steps back). When that is no smaller than the frame
+    itself, or the frame is over 256 bytes, the frame is stored whole as a
+    keyframe for the game to copy instead.
+
+    Args:
+        previous (bytes-like): Packed bytes of the previous frame.
+        current (bytes-like): Packed bytes of this frame (same length).
+
+    Returns:
+        tuple: ("sparse" or "key", delta stream, number of changed bytes).
+    """
+    changes = [(offset, a ^ b) for offset, (a, b) in enumerate(zip(previous, current)) if a != b]
+    if len(current) <= DELTA_MAX_SPARSE_FRAME and len(changes) < DELTA_KEY and 2 * len(changes) < len(current):
+        stream = bytearray((len(changes),))
+        for offset, value in changes:
+            stream += bytes((offset, value))
+        return "sparse", bytes(stream), len(changes)
+    return "key", bytes((DELTA_KEY,)) + bytes(current), len(changes)
+
+
+def apply_xor_delta(frame, stream, pos=0):
+    """
+    Apply one delta stream written by ``xor_delta`` to a frame, in place.
+
+    Args:
+        frame (bytearray): Previous frame's bytes; updated to the next frame.
+        stream (bytes-like): Buffer holding the delta stream.
+        pos (int): Offset of the stream in ``stream``.
+
+    Returns:
+        int: Offset of the next stream.
+    """
+    header, pos = stream[pos], pos + 1
+    if header == DELTA_KEY:
+        frame[:] = stream[pos:pos + len(frame)]
+        return pos + len(frame)
+    for pair in range(header):
+        frame[stream[pos + 2 * pair]] ^= stream[pos + 2 * pair + 1]
+    return pos + 2 * header
+
+
+def anim_delta_summary(stats):
+    """
+    Format animation delta statistics as an assembler comment line.
+
+    Each keyframe costs its form byte, so a sheet of unrelated frames can come
+    out slightly larger; that is reported as overhead rather than a negative
+    saving.
+
+    Args:
+        stats (dict): Totals filled in by ``iter_sprite_records``.
+
+    Returns:
+        str: One-line summary, e.g. "; Anim delta: 2 animations, 16 frames, ...".
+    """
+    ratio = stats["packed"] / stats["raw"] if stats["raw"] else 1.0
+    saved = stats["raw"] - stats["packed"]
+    outcome = f"{saved} bytes saved" if saved >= 0 else f"{-saved} bytes of keyframe overhead"
+    return (
+        f"; Anim delta: {stats['animations']} animations, {stats['frames']} frames, "
+        f"{stats['sparse']} deltas, {stats['key']} keyframes, "
+        f"{stats['raw']} -> {stats['packed']} bytes ({ratio:.0%}), {outcome}"
+    )
+
+
+SpriteRecord = collections.namedtuple(
+    "SpriteRecord", "index x_index y_index data ascii_lines alias shifts compression delta",
+    defaults=(None, None, None)
+)
+SpriteRecord.__doc__ = """
+One converted sprite: running index, sheet position, packed bytes (list of
+int), ASCII preview lines, dedupe alias (None for a unique sprite),
+pre-shifted copies as (shift, bytes) pairs (None unless --preshift),
+(codecs, raw size, compressed size) when --compress replaced the bytes and
+(kind, previous X, previous Y, changed bytes, frame size) when --anim-delta
+replaced them with an XOR delta from the previous frame.
+"""
+
+
+def iter_sprite_records(
+    png_file,
+    exclude_colour="#000000",
+    sprite_width=10,
+    sprite_height=16,
+    gap_x=0,
+    gap_y=0,
+    offset_x=0,
+    offset_y=0,
+    alpha_threshold=254,
+    exclude_tolerance=8,
+    inverse=False,
+    mirror=False,
+    mirror_align=False,
+    flip_vertical=False,
+    use_numpy=None,
+    dedupe=False,
+    dedupe_transforms=False,
+    preshift=0,
+    compress=None,
+    verify_compression=False,
+    rows=None,
+    cols=None,
+    cells=None,
+    mask=None,
+    mask_outline=False,
+    anim_delta=None,
+    workers=0,
+    want_ascii=False,
+    image_cache=None,
+    report=None,
+    stats=None
+):
+    """
+    Convert a PNG sprite sheet into a stream of sprite records.
+
+    Sprites are produced one band of the sheet at a time, so consumers can
+    write them out as they arrive. Arguments are as for
+    ``convert_png_to_zx_defb_pypng``; ``want_ascii`` requests preview lines.
+    With an ``image_cache`` (``DecodedImageCache``) the decoded rows are
+    reused across calls instead of streaming them from the file. With cell
+    selectors only the selected cells are packed, and no rows are read past
+    the last selected band. With ``workers`` > 1 the bands are packed on a
+    process pool (see ``_pack_cells_parallel``).
+    When dedupe, compression or animation deltas are on, ``report["dedupe"]`` /
+    ``report["compression"]`` / ``report["anim_delta"]`` are complete once the
+    generator is exhausted.
+
+    Yields:
+        SpriteRecord: One record per sprite cell, in sheet order.
+
+    Raises:
+        ValueError: If ``anim_delta`` is combined with dedupe or pre-shifting.
+    """
+    if anim_delta and (dedupe or dedupe_transforms or preshift):
+        raise ValueError("--anim-delta cannot be combined with --dedupe or --preshift")
+    stage = stage_timer(stats)
+    with stage("decode"):
+        if image_cache is not None:
+            width, height, pixels, meta = image_cache.read(png_file)
+        else:
+            width, height, pixels, meta = open_png_reader(png_file).read()
+
+    packer_args = (
+        sprite_width, sprite_height, exclude_colour, exclude_tolerance, alpha_threshold,
+        inverse, mirror, mirror_align, flip_vertical, use_numpy
+    )
+    xs, ys = sprite_grid(width, height, sprite_width, sprite_height, gap_x, gap_y, offset_x, offset_y)
+    selection = select_cells(len(xs), len(ys), rows, cols, cells)
+    if workers > 1:
+        if selection is None:
+            selection = [(y_sprite_index, list(range(len(xs)))) for y_sprite_index in range(len(ys))]
+        sprites = _pack_cells_parallel(pixels, width, meta, xs, ys, selection, packer_args, want_ascii, workers, stats)
+    elif selection is None:
+        pack = make_sprite_packer(width, meta, *packer_args, want_ascii=want_ascii, stats=stats)
+        sprites = pack(iter_row_bands(pixels, ys, sprite_height, stats), xs)
+    else:
+        pack = make_sprite_packer(width, meta, *packer_args, want_ascii=want_ascii, stats=stats)
+        sprites = _pack_selected_cells(pack, pixels, xs, ys, sprite_height, selection, stats)
+    if selection is None:
+        band_count, sprite_count = len(ys), len(xs) * len(ys)
+    else:
+        band_count, sprite_count = len(selection), sum(len(x_indexes) for _, x_indexes in selection)
+    if stats is not None:
+        stats.count("pixels", width * band_count * sprite_height)
+        stats.count("sprites", sprite_count)
+
+    if dedupe or dedupe_transforms:
+        dedupe_stats = {}
+        if report is not None:
+            report["dedupe"] = dedupe_stats
+        sprites = dedupe_sprites(sprites, math.ceil(sprite_width / 8), dedupe_transforms, dedupe_stats)
+    else:
+        sprites = ((*sprite, None) for sprite in sprites)
+
+    bytes_per_row = math.ceil(sprite_width / 8)
+    offsets = preshift_offsets(preshift) if preshift else []
+    if anim_delta:
+        delta_stats = {"animations": 0, "frames": 0, "sparse": 0, "key": 0, "raw": 0, "packed": 0}
+        if report is not None:
+            report["anim_delta"] = delta_stats
+        animation_of = None if anim_delta == "rows" else {
+            cell: number for number, animation in enumerate(anim_delta) for cell in animation
+        }
+        previous_frames = {}
+    if compress:
+        compression_stats = {"codec": compress, "sprites": 0, "raw": 0, "packed": 0}
+        if report is not None:
+            report["compression"] = compression_stats
+        memo = {}
+    def shift_and_mask(record):
+        if offsets:
+            with stage("preshift"):
+                shifts = [(shift, preshift_sprite(record.data, bytes_per_row, shift, inverse)) for shift in offsets]
+            record = record._replace(shifts=shifts)
+        if mask:
+            with stage("mask"):
+                record = mask_record(record, bytes_per_row, mask, mask_outline)
+        return record
+
+    for sprite_index, sprite in enumerate(sprites):
+        record = SpriteRecord(sprite_index, *sprite)
+        if record.alias is None:
+            record = shift_and_mask(record)
+        if anim_delta:
+            animation = record.y_index if animation_of is None else animation_of.get((record.x_index, record.y_index))
+            if animation is not None:
+                previous = previous_frames.get(animation)
+                previous_frames[animation] = record
+                delta_stats["frames"] += 1
+                if previous is None:
+                    delta_stats["animations"] += 1
+                else:
+                    with stage("delta"):
+                        kind, stream, changed = xor_delta(previous.data, record.data)
+                    delta_stats[kind] += 1
+                    delta_stats["raw"] += len(record.data)
+                    delta_stats["packed"] += len(stream)
+                    delta = (kind, previous.x_index, previous.y_index, changed, len(record.data))
+                    record = record._replace(data=stream, delta=delta)
+        if compress and record.alias is None:
+            with stage("compress"):
+                record = compress_record(record, compress, memo, verify_compression)
+            codecs, raw_size, packed_size = record.compression
+            compression_stats["sprites"] += 1
+            compression_stats["raw"] += raw_size
+            compression_stats["packed"] += packed_size
+            for name in codecs.split("+"):
+                compression_stats[name] = compression_stats.get(name, 0) + 1
+        if record.alias is not None and (offsets or mask or compress):
+            # dedupe_sprites counted the raw bytes; the alias really saves what
+            # its own bytes would have cost after pre-shifting, masking and
+            # compression (a mirrored copy may compress differently).
+            own = shift_and_mask(record._replace(alias=None))
+            if compress:
+                with stage("compress"):
+                    own = compress_record(own, compress, memo)
+            own_size = sum(len(data) for _, data in own.shifts or [(None, own.data)])
+            dedupe_stats["bytes_saved"] += own_size - len(record.data)
+        yield record
+
+
+def _pack_selected_cells(pack, pixels, xs, ys, sprite_height, selection, stats=None):
+    """
+    Pack only the selected cells, decoding just the bands that hold them.
+
+    Args:
+        pack (callable): Packer from ``make_sprite_packer``.
+        pixels (iterable): Row iterator from the PNG reader.
+        xs, ys (list of int): Sprite grid from ``sprite_grid``.
+        sprite_height (int): Height of each sprite in pixels.
+        selection (list of tuple): From ``select_cells``.
+        stats (StageStats, optional): Collects per-stage timings.
+
+    Yields:
+        tuple: (x_sprite_index, y_sprite_index, flat_bytes, ascii_lines) per selected cell.
+    """
+    bands = iter_row_bands(pixels, [ys[y_sprite_index] for y_sprite_index, _ in selection], sprite_height, stats)
+    for (y_sprite_index, x_indexes), (_, band) in zip(selection, bands):
+        packed = pack([(y_sprite_index, band)], [xs[x_sprite_index] for x_sprite_index in x_indexes])
+        for x_sprite_index, (_, _, flat_bytes, ascii_lines) in zip(x_indexes, packed):
+            yield x_sprite_index, y_sprite_index, flat_bytes, ascii_lines
+
+
+PACKER_META_KEYS = ("planes", "bitdepth", "alpha", "greyscale", "palette", "transparent")
+
+
+def _pack_band_chunk(task):
+    """
+    Pack a run of bands whose rows live in shared memory (process pool worker).
+
+    Args:
+        task (tuple): (shared memory name, bytes per row, row typecode, width, meta,
+            xs, [(band slot, y_sprite_index, x_indexes), ...], packer arguments, want_ascii).
+
+    Returns:
+        list of tuple: (x_sprite_index, y_sprite_index, flat_bytes, ascii_lines) in order.
+    """
+    import multiprocessing.shared_memory  # Python 3.8+, only needed with --parallel
+
+    shm_name, row_size, typecode, width, meta, xs, chunk, packer_args, want_ascii = task
+    sprite_height = packer_args[1]
+    pack = make_sprite_packer(width, meta, *packer_args, want_ascii=want_ascii)
+    shm = multiprocessing.shared_memory.SharedMemory(name=shm_name)
+    try:
+        results = []
+        for slot, y_sprite_index, x_indexes in chunk:
+            band = []
+            for line in range(sprite_height):
+                offset = (slot * sprite_height + line) * row_size
+                row = array.array(typecode)
+                row.frombytes(shm.buf[offset:offset + row_size])
+                band.append(row)
+            packed = pack([(y_sprite_index, band)], [xs[x_sprite_index] for x_sprite_index in x_indexes])
+            for x_sprite_index, (_, _, flat_bytes, ascii_lines) in zip(x_indexes, packed):
+                results.append((x_sprite_index, y_sprite_index, flat_bytes, ascii_lines))
+        return results
+    finally:
+        shm.close()
+
+
+def _pack_cells_parallel(pixels, width, meta, xs, ys, selection, packer_args, want_ascii, workers, stats=None):
+    """
+    Pack the selected bands of a sheet across a process pool.
+
+    The rows of every selected band are copied once into a
+    ``multiprocessing.shared_memory`` block; workers read their bands from it
+    by name, so no pixels are pickled. Results come back in sheet order and
+    are identical to the serial packers'.
+
+    Args:
+        pixels (iterable): Row iterator from the PNG reader.
+        width (int): Width of the sprite sheet in pixels.
+        meta (dict): PNG metadata as returned by ``png.Reader.read()``.
+        xs, ys (list of int): Sprite grid from ``sprite_grid``.
+        selection (list of tuple): (y_sprite_index, x_indexes) bands to pack.
+        packer_args (tuple): Positional arguments for ``make_sprite_packer`` after ``meta``.
+        want_ascii (bool): Build ASCII preview lines.
+        workers (int): Number of worker processes.
+        stats (StageStats, optional): Records "decode" and "parallel" times.
+
+    Yields:
+        tuple: (x_sprite_index, y_sprite_index, flat_bytes, ascii_lines) per cell.
+    """
+    if not selection:
+        return
+    import multiprocessing.shared_memory  # Python 3.8+, only needed with --parallel
+
+    stage = stage_timer(stats)
+    sprite_height = packer_args[1]
+    typecode = "H" if meta["bitdepth"] > 8 else "B"
+    row_size = width * meta["planes"] * array.array(typecode).itemsize
+
+    shm = multiprocessing.shared_memory.SharedMemory(create=True, size=len(selection) * sprite_height * row_size)
+    try:
+        bands = iter_row_bands(pixels, [ys[y_sprite_index] for y_sprite_index, _ in selection], sprite_height, stats)
+        for slot, (_, band) in enumerate(bands):
+            with stage("decode"):
+                for line, row in enumerate(band):
+                    offset = (slot * sprite_height + line) * row_size
+                    shm.buf[offset:offset + row_size] = array.array(typecode, row).tobytes()
+
+        # A few chunks per worker keeps the pool busy when bands differ in cost.
+        slots = [(slot, y_sprite_index, x_indexes) for slot, (y_sprite_index, x_indexes) in enumerate(selection)]
+        chunk_size = max(1, math.ceil(len(slots) / (workers * 4)))
+        # Only the colour-type keys the packers read; pypng's meta is not picklable as a whole.
+        packer_meta = {key: meta[key] for key in PACKER_META_KEYS if key in meta}
+        tasks = [
+            (shm.name, row_size, typecode, width, packer_meta, xs, slots[i:i + chunk_size], packer_args, want_ascii)
+            for i in range(0, len(slots), chunk_size)
+        ]
+        with stage("parallel"):
+            with concurrent.futures.ProcessPoolExecutor(max_workers=min(workers, len(tasks))) as pool:
+                chunks = list(pool.map(_pack_band_chunk, tasks))
+    finally:
+        shm.close()
+        shm.unlink()
+
+    for chunk in chunks:
+        yield from chunk
+
+
+class DefbSink:
+    """
+    Writes sprite records as a DEFB listing to a text file handle as they arrive.
+
+    The text written is identical to the listing returned by
+    ``convert_png_to_zx_defb_pypng`` (no trailing newline).
+    """
+
+    def __init__(
+        self, file, use_hex=False, use_bin=False, use_labels=False, preview_ascii=False,
+        preshift_table=False, mask=None, stats=None
+    ):
+        self.file = file
+        self.format_options = (use_hex, use_bin, use_labels, preview_ascii)
+        self.preshift_table = preshift_table
+        self.mask = mask
+        self.stage = stage_timer(stats)
+        self.started = False
+
+    def _write_lines(self, lines):
+        if self.started:
+            self.file.write("\n")
+        self.file.write("\n".join(lines))
+        self.started = True
+
+    def write(self, record):
+        with self.stage("format"):
+            self._write_lines(format_sprite_block(
+                record.index, record.x_index, record.y_index, record.data,
+                record.ascii_lines, record.alias, *self.format_options,
+                shifts=record.shifts, shift_table=self.preshift_table, compression=record.compression,
+                mask_layout=self.mask, delta=record.delta
+            ))
+
+    def close(self, report):
+        if "dedupe" in report:
+            self._write_lines([dedupe_summary(report["dedupe"])])
+        if "anim_delta" in report:
+            self._write_lines([anim_delta_summary(report["anim_delta"])])
+        if "compression" in report:
+            self._write_lines([compression_summary(report["compression"])])
+
+
+class BinarySink:
+    """
+    Writes the packed bytes of each unique sprite record to a binary file handle.
+
+    Pre-shifted records write all their copies back to back, shift 0 first.
+    Compressed records write their streams the same way.
+    """
+
+    def __init__(self, file, stats=None):
+        self.file = file
+        self.stage = stage_timer(stats)
+        self.size = 0
+
+    def write(self, record):
+        if record.alias is None:
+            with self.stage("write"):
+                if record.shifts:
+                    for _, shifted_bytes in record.shifts:
+                        self.size += self.file.write(bytes(shifted_bytes))
+                else:
+                    self.size += self.file.write(bytes(record.data))
+
+    def close(self, report):
+        pass
+
+
+class AsciiSink:
+    """Collects the ASCII preview block of every sprite record (for --animate)."""
+
+    def __init__(self):
+        self.blocks = []
+
+    def write(self, record):
+        self.blocks.append(record.ascii_lines)
+
+    def close(self, report):
+        pass
+
+
+class CHeaderSink:
+    """
+    Writes sprite records as a C header, one ``const unsigned char`` array per block.
+
+    Arrays are named like the assembler labels (``sprite_X_Y``, ``sprite_X_Y_sN``
+    for pre-shifted copies); dedupe aliases become ``#define``s.
+    """
+
+    def __init__(self, file, sprite_width, sprite_height, source=None, path=None, stats=None):
+        self.file = file
+        self.stage = stage_timer(stats)
+        self.guard = re.sub(r"\W", "_", os.path.basename(path or "sprites")).upper()
+        if not self.guard[0].isalpha():
+            self.guard = "H_" + self.guard  # macro names cannot start with a digit
+        if not self.guard.endswith("_H"):
+            self.guard += "_H"
+        origin = f" from {source}" if isinstance(source, str) else ""
+        self.file.write(
+            f"/* ZX Spectrum sprite data{origin}: {sprite_width}x{sprite_height} pixels, "
+            f"{math.ceil(sprite_width / 8)} bytes per row */\n"
+            f"#ifndef {self.guard}\n#define {self.guard}\n\n"
+        )
+
+    def _write_array(self, name, data):
+        lines = [f"static const unsigned char {name}[{len(data)}] = {{"]
+        lines += [
+            "    " + ", ".join([C_HEX_STRINGS[b] for b in data[i:i+8]]) + ","
+            for i in range(0, len(data), 8)
+        ]
+        lines.append("};")
+        self.file.write("\n".join(lines) + "\n")
+
+    def write(self, record):
+        label = f"sprite_{record.x_index}_{record.y_index}"
+        with self.stage("format"):
+            self.file.write(f"/* Sprite {record.index} (X={record.x_index}, Y={record.y_index}) */\n")
+            if record.alias is not None:
+                original_index, original_x, original_y, how = record.alias
+                self.file.write(f"#define {label} sprite_{original_x}_{original_y} /* {how} */\n\n")
+                return
+            if record.shifts:
+                for shift, shifted_bytes in record.shifts:
+                    self._write_array(f"{label}_s{shift}", shifted_bytes)
+                self.file.write(f"#define {label} {label}_s{record.shifts[0][0]}\n")
+            else:
+                self._write_array(label, record.data)
+            self.file.write("\n")
+
+    def close(self, report):
+        self.file.write(f"#endif /* {self.guard} */\n")
+
+
+class JsonSink:
+    """
+    Writes sprite metadata as JSON: label, sheet position and .bin offset/size per sprite.
+
+    Sprite entries are written as they arrive; the conversion report follows
+    them on close.
+    """
+
+    def __init__(self, file, header, stats=None):
+        self.file = file
+        self.stage = stage_timer(stats)
+        self.offset = 0
+        self.placed = {}
+        self.file.write("{\n" + "".join(f"  {json.dumps(key)}: {json.dumps(value)},\n" for key, value in header.items()))
+        self.file.write('  "sprites": [')
+        self.separator = "\n    "
+
+    def write(self, record):
+        label = f"sprite_{record.x_index}_{record.y_index}"
+        entry = {"index": record.index, "x": record.x_index, "y": record.y_index, "label": label}
+        with self.stage("format"):
+            if record.alias is not None:
+                original_label = f"sprite_{record.alias[1]}_{record.alias[2]}"
+                entry["alias"] = original_label
+                entry["transform"] = record.alias[3]
+                entry["offset"], entry["size"] = self.placed[original_label]
+            else:
+                entry["offset"] = self.offset
+                if record.shifts:
+                    entry["shifts"] = []
+                    for shift, shifted_bytes in record.shifts:
+                        entry["shifts"].append({"shift": shift, "offset": self.offset, "size": len(shifted_bytes)})
+                        self.offset += len(shifted_bytes)
+                else:
+                    self.offset += len(record.data)
+                entry["size"] = self.offset - entry["offset"]
+                self.placed[label] = (entry["offset"], entry["size"])
+            if record.compression:
+                codecs, raw_size, packed_size = record.compression
+                entry["compression"] = {"codecs": codecs, "raw": raw_size, "packed": packed_size}
+            if record.delta:
+                kind, previous_x, previous_y, changed, frame_size = record.delta
+                entry["delta"] = {"kind": kind, "from": f"sprite_{previous_x}_{previous_y}", "changed": changed}
+            self.file.write(self.separator + json.dumps(entry))
+            self.separator = ",\n    "
+
+    def close(self, report):
+        self.file.write(f'\n  ],\n  "size": {self.offset},\n  "report": {json.dumps(report)}\n}}\n')
+
+
+# --emit formats: name -> default file suffix (appended to the -o / PNG file stem).
+OUTPUT_FORMATS = {
+    "asm": "_dec.asm",
+    "asm_hex": "_hex.asm",
+    "asm_bin": "_bin.asm",
+    "bin": ".bin",
+    "h": ".h",
+    "json": ".json",
+}
+
+
+def make_format_sink(fmt, file, options, path=None, stats=None):
+    """
+    Build the sink that writes one output format.
+
+    Args:
+        fmt (str): A key of ``OUTPUT_FORMATS``.
+        file: Handle to write to (binary for "bin", text otherwise).
+        options (dict): Conversion keyword arguments (see ``conversion_options``).
+        path (str, optional): Final output path (names the C header's include guard).
+        stats (StageStats, optional): Collects per-stage timings.
+
+    Returns:
+        object: Sink with ``write(record)`` and ``close(report)`` methods.
+    """
+    if fmt.startswith("asm"):
+        return DefbSink(
+            file, fmt == "asm_hex", fmt == "asm_bin", options.get("use_labels", False),
+            options.get("preview_ascii", False), options.get("preshift_table", False), options.get("mask"), stats
+        )
+    if fmt == "bin":
+        return BinarySink(file, stats)
+    if fmt == "h":
+        return CHeaderSink(file, options["sprite_width"], options["sprite_height"], options.get("png_file"), path, stats)
+    header = {
+        "source": options.get("png_file") if isinstance(options.get("png_file"), str) else None,
+        "sprite_width": options["sprite_width"],
+        "sprite_height": options["sprite_height"],
+        "bytes_per_row": math.ceil(options["sprite_width"] / 8),
+        "preshift": options.get("preshift", 0),
+        "mask": options.get("mask"),
+        "compress": options.get("compress"),
+    }
+    return JsonSink(file, header, stats)
+
+
+def convert_png_to_formats(png_file, formats, report=None, stats=None, **options):
+    """
+    Convert a PNG sprite sheet once and render it in several output formats.
+
+    The sheet is decoded and packed a single time; every sprite record is
+    handed to one sink per format.
+
+    Args:
+        png_file (str or bytes): Path to the input PNG file, or its contents.
+        formats (iterable of str): Keys of ``OUTPUT_FORMATS``.
+        report (dict, optional): Filled with statistics about the conversion.
+        stats (StageStats, optional): Collects per-stage timings and memory.
+        **options: Other keyword arguments of ``convert_png_to_zx_defb_pypng``.
+
+    Returns:
+        dict: Format -> output (bytes for "bin", str otherwise).
+    """
+    report = report if report is not None else {}
+    options["png_file"] = png_file
+    buffers = {fmt: io.BytesIO() if fmt == "bin" else io.StringIO() for fmt in formats}
+    sinks = [make_format_sink(fmt, buffer, options, stats=stats) for fmt, buffer in buffers.items()]
+    record_options = {
+        name: value for name, value in options.items()
+        if name not in ("use_hex", "use_bin", "use_labels", "preview_ascii", "preshift_table")
+    }
+    records = iter_sprite_records(
+        **record_options, want_ascii=options.get("preview_ascii", False), report=report, stats=stats
+    )
+    write_sprite_records(records, sinks, report)
+    return {fmt: buffer.getvalue() for fmt, buffer in buffers.items()}
+
+
+def write_sprite_records(records, sinks, report):
+    """
+    Feed every sprite record to each sink, then close the sinks.
+
+    Args:
+        records (iterable of SpriteRecord): Records from ``iter_sprite_records``.
+        sinks (list): Objects with ``write(record)`` and ``close(report)`` methods.
+        report (dict): Conversion report handed to the sinks on close.
+
+    Returns:
+        int: Number of records written.
+    """
+    count = 0
+    for record in records:
+        for sink in sinks:
+            sink.write(record)
+        count += 1
+    for sink in sinks:
+        sink.close(report)
+    return count
+
+
+def convert_png_to_zx_defb_pypng(
+    png_file,
+    exclude_colour="#000000",
+    sprite_width=10,
+    sprite_height=16,
+    gap_x=0,
+    gap_y=0,
+    offset_x=0,
+    offset_y=0,
+    use_hex=False,
+    use_bin=False,
+    use_labels=False,
+    alpha_threshold=254,
+    preview_ascii=False,
+    exclude_tolerance=8,
+    inverse=False,
+    mirror=False,
+    mirror_align=False,
+    flip_vertical=False,
+    use_numpy=None,
+    dedupe=False,
+    dedupe_transforms=False,
+    preshift=0,
+    preshift_table=False,
+    compress=None,
+    verify_compression=False,
+    rows=None,
+    cols=None,
+    cells=None,
+    mask=None,
+    mask_outline=False,
+    anim_delta=None,
+    workers=0,
+    image_cache=None,
+    report=None,
+    stats=None
+):
+    """
+    Convert a PNG sprite sheet to ZX Spectrum DEFB output with options for inversion, mirroring and preview.
+
+    Args:
+        png_file (str or bytes): Path to the input PNG file, or its contents.
+        exclude_colour (str): Colour in hex to treat as background.
+        sprite_width (int): Width of each sprite in pixels.
+        sprite_height (int): Height of each sprite in pixels.
+        gap_x (int): Horizontal gap between sprites in pixels.
+        gap_y (int): Vertical gap between sprites in pixels.
+        offset_x (int): Horizontal offset in pixels.
+        offset_y (int): Vertical offset in pixels.
+        use_hex (bool): Output DEFB values in hexadecimal format.
+        use_bin (bool): Output DEFB values in binary format.
+        use_labels (bool): Add sprite labels in the output.
+        alpha_threshold (int): Ignore pixels below this alpha threshold.
+        preview_ascii (bool): Include ASCII preview in output.
+        exclude_tolerance (int): Colour match tolerance.
+        inverse (bool): Invert logic to encode the exclude colour instead.
+        mirror (bool): Mirror sprites horizontally.
+        mirror_align (bool): Also align mirrored sprite bytes.
+        flip_vertical (bool): Flip the sprite vertically.
+        use_numpy (bool, optional): Use the vectorised NumPy backend. None picks it
+            automatically when NumPy is installed.
+        dedupe (bool): Emit repeated sprites once and alias the duplicates' labels with EQU.
+        dedupe_transforms (bool): Also alias mirrored and vertically flipped copies.
+        preshift (int): Emit 2, 4 or 8 copies of each sprite shifted right by 0-7
+            pixels, one byte wider per row (0 = off).
+        preshift_table (bool): Add a DEFW shift-to-address table per pre-shifted sprite.
+        compress (str, optional): Compress each sprite's bytes with "rle", "lz" or
+            "auto" (smaller of the two per sprite, with a codec id byte).
+        verify_compression (bool): Decode every compressed stream and check it round-trips.
+        rows (list of int, optional): Only convert these sprite rows.
+        cols (list of int, optional): Only convert these sprite columns.
+        cells (list of tuple, optional): Also convert these (x, y) sprite cells.
+        mask (str, optional): Add an AND-mask to every sprite, "interleaved"
+            (mask, data byte pairs) or "planes" (data bytes then mask bytes).
+        mask_outline (bool): Grow the mask by one pixel around the sprite's ink.
+        anim_delta (str or list, optional): Store animations as XOR deltas: "rows"
+            (each sprite row is an animation) or a list of (x, y) cell lists. The
+            first frame of each is kept whole; later frames become ``xor_delta``
+            streams against the frame before.
+        workers (int): Pack the sheet's bands on this many processes (0 or 1 = serial).
+            The output is identical either way.
+        image_cache (DecodedImageCache, optional): Reuse decoded images across conversions.
+        report (dict, optional): Filled with statistics about the conversion (e.g. "dedupe").
+        stats (StageStats, optional): Collects per-stage timings and memory for --stats.
+
+    Returns:
+        tuple: Assembler output string, raw binary output, optional ASCII block list.
+    """
+    report = report if report is not None else {}
+    records = iter_sprite_records(
+        png_file, exclude_colour, sprite_width, sprite_height, gap_x, gap_y, offset_x, offset_y,
+        alpha_threshold, exclude_tolerance, inverse, mirror, mirror_align, flip_vertical,
+        use_numpy, dedupe, dedupe_transforms, preshift, compress, verify_compression, rows, cols, cells,
+        mask, mask_outline, anim_delta, workers, want_ascii=preview_ascii, image_cache=image_cache, report=report, stats=stats
+    )
+
+    listing, binary = io.StringIO(), io.BytesIO()
+    sinks = [
+        DefbSink(listing, use_hex, use_bin, use_labels, preview_ascii, preshift_table, mask, stats),
+        BinarySink(binary, stats)
+    ]
+    ascii_sink = AsciiSink()
+    if preview_ascii:
+        sinks.append(ascii_sink)
+
+    write_sprite_records(records, sinks, report)
+    return listing.getvalue(), binary.getvalue(), ascii_sink.blocks
+
+
+SCREEN_WIDTH, SCREEN_HEIGHT = 256, 192
+SCREEN_BITMAP_SIZE = SCREEN_WIDTH // 8 * SCREEN_HEIGHT
+SCREEN_ATTRIBUTE_SIZE = SCREEN_WIDTH // 8 * SCREEN_HEIGHT // 8
+DEFAULT_ATTRIBUTE = 0x38  # white paper, black ink
+
+# Offset from 0x4000 of the first byte of each pixel row: thirds, then pixel row within
+# the character row, then character row.
+SCREEN_ROW_OFFSETS = [((y & 0xC0) << 5) | ((y & 0x07) << 8) | ((y & 0x38) << 2) for y in range(SCREEN_HEIGHT)]
+
+# Spectrum colours 0-7 at normal and BRIGHT intensity.
+SPECTRUM_COLOURS = [
+    ((0xFF if bright else 0xD7) * ((colour >> 1) & 1),
+     (0xFF if bright else 0xD7) * ((colour >> 2) & 1),
+     (0xFF if bright else 0xD7) * (colour & 1), colour, bright)
+    for bright in (False, True) for colour in range(8)
+]
+
+
+def parse_cell_position(text):
+    """
+    Parse a "COLUMN,ROW" character-cell position for --screen_at.
+
+    Raises:
+        argparse.ArgumentTypeError: If the text is not two integers.
+    """
+    try:
+        column, row = (int(part) for part in text.split(","))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid position '{text}' (expected COLUMN,ROW, e.g. 4,2)") from None
+    if not (0 <= column < SCREEN_WIDTH // 8 and 0 <= row < SCREEN_HEIGHT // 8):
+        raise argparse.ArgumentTypeError(f"position '{text}' is off screen (columns 0-31, rows 0-23)")
+    return column, row
+
+
+def sample_rgb_reader(meta):
+    """
+    Return a function giving the 8-bit (r, g, b) colour of pixel ``x`` of a decoded PNG row.
+
+    Args:
+        meta (dict): PNG metadata as returned by ``png.Reader.read()``.
+
+    Returns:
+        callable: ``rgb(row, x)``.
+    """
+    planes = meta["planes"]
+    if meta.get("palette"):
+        palette = [tuple(entry[:3]) for entry in meta["palette"]]
+        return lambda row, x: palette[row[x]]
+    if meta.get("greyscale"):
+        scale = 255 / ((1 << meta["bitdepth"]) - 1)
+        return lambda row, x: (round(row[x * planes] * scale),) * 3
+    shift = 8 if meta["bitdepth"] > 8 else 0
+    return lambda row, x: tuple(v >> shift for v in row[x * planes:x * planes + 3])
+
+
+_nearest_colour_cache = {}
+
+
+def nearest_spectrum_colour(rgb):
+    """
+    Map an (r, g, b) colour to the nearest Spectrum colour (cached per colour).
+
+    Returns:
+        tuple: (colour 0-7, bright).
+    """
+    if rgb not in _nearest_colour_cache:
+        best = min(SPECTRUM_COLOURS, key=lambda c: (c[0] - rgb[0]) ** 2 + (c[1] - rgb[1]) ** 2 + (c[2] - rgb[2]) ** 2)
+        _nearest_colour_cache[rgb] = best[3], best[4]
+    return _nearest_colour_cache[rgb]
+
+
+def cell_attribute(band, x, cell_bytes, rgb):
+    """
+    Derive the attribute byte of one 8x8 character cell from its colours.
+
+    INK is the most common colour of the cell's set pixels and PAPER the most
+    common colour of its clear pixels, each mapped to the nearest Spectrum
+    colour. BRIGHT follows the INK colour (or PAPER when INK is black).
+
+    Args:
+        band (list): The eight decoded PNG rows holding the cell.
+        x (int): Left pixel column of the cell.
+        cell_bytes (list of int): The cell's eight packed bytes.
+        rgb (callable): From ``sample_rgb_reader``.
+
+    Returns:
+        int: Attribute byte (FLASH off).
+    """
+    ink_counts, paper_counts = collections.Counter(), collections.Counter()
+    for row, byte in zip(band, cell_bytes):
+        for bit in range(8):
+            counts = ink_counts if byte & (0x80 >> bit) else paper_counts
+            counts[rgb(row, x + bit)] += 1
+
+    paper, paper_bright = nearest_spectrum_colour(paper_counts.most_common(1)[0][0]) if paper_counts else (0, False)
+    if ink_counts:
+        ink, ink_bright = nearest_spectrum_colour(ink_counts.most_common(1)[0][0])
+    else:
+        ink, ink_bright = (7 if paper == 0 else 0), paper_bright
+    bright = ink_bright if ink != 0 else paper_bright
+    return (bright << 6) | (paper << 3) | ink
+
+
+def convert_png_to_screen(
+    png_file,
+    exclude_colour="#000000",
+    exclude_tolerance=8,
+    alpha_threshold=254,
+    inverse=False,
+    offset_x=0,
+    offset_y=0,
+    at_column=0,
+    at_row=0,
+    attributes=False,
+    use_numpy=None,
+    image_cache=None,
+    stats=None
+):
+    """
+    Convert an image into a Spectrum screen in display-file order, ready to copy to 0x4000.
+
+    The image (from ``offset_x``/``offset_y``, up to 256x192 pixels) is cut into
+    8x8 character cells and packed by the normal sprite packer; each cell's
+    eight bytes are then stored at their display-file offsets using
+    ``SCREEN_ROW_OFFSETS``. Smaller images cover whole character cells from
+    ``at_column``/``at_row``; the rest of the screen is left clear.
+
+    Args:
+        png_file (str or bytes): Path to the input PNG file, or its contents.
+        exclude_colour (str): Colour in hex to treat as background (PAPER).
+        exclude_tolerance (int): Colour match tolerance.
+        alpha_threshold (int): Ignore pixels below this alpha threshold.
+        inverse (bool): Invert logic to encode the exclude colour instead.
+        offset_x (int): Left edge of the area to convert, in image pixels.
+        offset_y (int): Top edge of the area to convert, in image pixels.
+        at_column (int): Character column (0-31) for the area's top-left cell.
+        at_row (int): Character row (0-23) for the area's top-left cell.
+        attributes (bool): Append the 768-byte attribute block, derived from the colours.
+        use_numpy (bool, optional): Use the vectorised NumPy backend (None = automatic).
+        image_cache (DecodedImageCache, optional): Reuse decoded images across conversions.
+        stats (StageStats, optional): Collects per-stage timings.
+
+    Returns:
+        bytes: 6144 bytes of bitmap, plus 768 attribute bytes when requested.
+    """
+    stage = stage_timer(stats)
+    with stage("decode"):
+        if image_cache is not None:
+            width, height, pixels, meta = image_cache.read(png_file)
+        else:
+            width, height, pixels, meta = open_png_reader(png_file).read()
+
+    pack = make_sprite_packer(
+        width, meta, 8, 8, exclude_colour, exclude_tolerance, alpha_threshold, inverse,
+        use_numpy=use_numpy, want_ascii=False, stats=stats
+    )
+    columns = max(0, min((width - offset_x) // 8, SCREEN_WIDTH // 8 - at_column))
+    rows = max(0, min((height - offset_y) // 8, SCREEN_HEIGHT // 8 - at_row))
+    xs = [offset_x + column * 8 for column in range(columns)]
+    ys = [offset_y + row * 8 for row in range(rows)]
+
+    bitmap = bytearray(SCREEN_BITMAP_SIZE)
+    attribute_block = bytearray([DEFAULT_ATTRIBUTE]) * SCREEN_ATTRIBUTE_SIZE
+    rgb = sample_rgb_reader(meta)
+    for y_cell, band in iter_row_bands(pixels, ys, 8, stats):
+        row = at_row + y_cell
+        for x_cell, _, cell_bytes, _ in pack([(y_cell, band)], xs):
+            column = at_column + x_cell
+            with stage("layout"):
+                for line, byte in enumerate(cell_bytes):
+                    bitmap[SCREEN_ROW_OFFSETS[row * 8 + line] + column] = byte
+            if attributes:
+                with stage("attributes"):
+                    attribute_block[row * 32 + column] = cell_attribute(band, xs[x_cell], cell_bytes, rgb)
+
+    if stats is not None:
+        stats.count("pixels", columns * rows * 64)
+        stats.count("sprites", columns * rows)
+    return bytes(bitmap) + (bytes(attribute_block) if attributes else b"")
+
+
+def format_screen_listing(screen, use_hex=False, use_bin=False, use_labels=False):
+    """
+    Format a screen from ``convert_png_to_screen`` as a DEFB listing.
+
+    Returns:
+        str: Bitmap block, followed by the attribute block when present.
+    """
+    lines = [f"; Screen bitmap ({SCREEN_BITMAP_SIZE} bytes, display-file order for 0x4000)"]
+    if use_labels:
+        lines.append("screen_bitmap:")
+    lines.extend(format_defb_lines(screen[:SCREEN_BITMAP_SIZE], use_hex, use_bin))
+    if len(screen) > SCREEN_BITMAP_SIZE:
+        lines += ["", f"; Screen attributes ({SCREEN_ATTRIBUTE_SIZE} bytes, for 0x5800)"]
+        if use_labels:
+            lines.append("screen_attributes:")
+        lines.extend(format_defb_lines(screen[SCREEN_BITMAP_SIZE:], use_hex, use_bin))
+    return "\n".join(lines)
+
+
+def run_screen_conversion(args, stats=None):
+    """
+    Convert ``args.filename`` with --screen and write the .bin and/or listing.
+
+    The listing goes to ``args.output`` (stdout when neither -o nor --binfile is set).
+
+    Returns:
+        int: Size of the screen data in bytes.
+    """
+    at_column, at_row = args.screen_at or (0, 0)
+    screen = convert_png_to_screen(
+        args.filename, args.exclude_colour, args.exclude_tolerance, args.alpha_threshold, args.inverse,
+        args.offset_x, args.offset_y, at_column, at_row, args.screen_attributes,
+        use_numpy=False if args.no_numpy else None, stats=stats
+    )
+    with stage_timer(stats)("write"):
+        if args.binfile:
+            with open(args.binfile, "wb") as f:
+                f.write(screen)
+        if args.output or not args.binfile:
+            listing = format_screen_listing(screen, args.hex, args.bin, args.labels)
+            if args.output:
+                with open(args.output, "w", encoding="utf-8") as f:
+                    f.write(listing)
+            else:
+                print(listing)
+    return len(screen)
+
+
+def build_arg_parser():
+    """
+    Build the command-line parser shared by the CLI and batch manifests.
+
+    Returns:
+        argparse.ArgumentParser: Parser for all converter options.
+    """
+    parser = argparse.ArgumentParser(
+        description="Convert a PNG sprite sheet into ZX Spectrum DEFB statements."
+    )
+    parser.add_argument("filename", nargs='?', default=None, help="Path to input PNG file")
+    parser.add_argument("--sprite_width", type=int, default=8, help="Width of each sprite in pixels")
+    parser.add_argument("--sprite_height", type=int, default=8, help="Height of each sprite in pixels")
+    parser.add_argument("--gap_x", type=int, default=0, help="Horizontal gap between sprites (default: 0)")
+    parser.add_argument("--gap_y", type=int, default=0, help="Vertical gap between sprites (default: 0)")
+    parser.add_argument("--offset_x", type=int, default=0, help="Horizontal offset in pixels (default: 0)")
+    parser.add_argument("--offset_y", type=int, default=0, help="Vertical offset in pixels (default: 0)")
+    parser.add_argument("--exclude_colour", default="#000000", help="Exclude/background colour in hex (default: #000000)")
+    parser.add_argument("--exclude_tolerance", type=int, default=8, help="Tolerance when matching exclude colour")
+    parser.add_argument("--alpha_threshold", type=int, default=254, help="Ignore pixels with alpha below this value (default: 254)")
+    parser.add_argument("--hex", action="store_true", help="Output DEFB values in hexadecimal")
+    parser.add_argument("--bin", action="store_true", help="Output DEFB values in binary format")
+    parser.add_argument("--labels", action="store_true", help="Add sprite_X_Y: label above each sprite")
+    parser.add_argument("--binfile", help="Output raw binary sprite data to .bin file")
+    parser.add_argument("--preview", action="store_true", help="Print ASCII preview of each sprite to terminal")
+    parser.add_argument("--inverse", action="store_true", help="Invert logic: treat exclude colour as pixel to encode")
+    parser.add_argument("--mirror", action="store_true", help="Mirror sprites horizontally")
+    parser.add_argument("--mirror-align", action="store_true", help="Right-align mirrored sprite by reversing byte order")
+    parser.add_argument("--flip-vertical", action="store_true", help="Flip sprite vertically (top-to-bottom)")
+    parser.add_argument("--animate", action="store_true", help="Animate ASCII preview of each sprite")
+    parser.add_argument("--delay", type=float, default=0.2, help="Delay in seconds between frames (default: 0.2)")
+    parser.add_argument("--sprite_data", help="Path to .BIN file containing ZX Spectrum sprite data")
+    parser.add_argument("--bin_output_png", help="Filename to write rendered PNG output from .BIN file")
+    parser.add_argument("--max_texture_width", type=int, default=0, help="Filename to write rendered PNG output from .BIN file")
+    parser.add_argument("-o", "--output", help="Output filename for DEFB listing (stdout if not specified)")
+    parser.add_argument("--mask", nargs="?", const="interleaved", choices=("interleaved", "planes"), help="Add an AND-mask to each sprite: interleaved mask/data bytes (default) or separate planes")
+    parser.add_argument("--mask_outline", action="store_true", help="Grow the --mask by a one-pixel outline around the sprite")
+    parser.add_argument("--screen", action="store_true", help="Write the image as a Spectrum screen in display-file order (for 0x4000)")
+    parser.add_argument("--screen_attributes", action="store_true", help="Append a 768-byte attribute block derived from the colours to --screen")
+    parser.add_argument("--screen_at", type=parse_cell_position, help="Character cell COLUMN,ROW where a smaller --screen image is placed (default: 0,0)")
+    parser.add_argument("--emit", type=parse_emit, action="append", metavar="FORMAT[=PATH]", help=f"Also write this format in the same pass ({', '.join(OUTPUT_FORMATS)}); repeatable")
+    parser.add_argument("--rows", type=parse_index_ranges, help="Only convert these sprite rows, e.g. 0-2,5")
+    parser.add_argument("--cols", type=parse_index_ranges, help="Only convert these sprite columns, e.g. 1,3-4")
+    parser.add_argument("--cells", type=parse_cell_ranges, help="Only convert these X:Y sprite cells, e.g. 0:0,2-5:1")
+    parser.add_argument("--no-numpy", action="store_true", help="Use the pure-Python converter even if NumPy is installed")
+    parser.add_argument("--dedupe", action="store_true", help="Emit repeated sprites once and alias duplicate labels with EQU")
+    parser.add_argument("--dedupe_transforms", action="store_true", help="Like --dedupe, also matching mirrored/flipped copies")
+    parser.add_argument("--preshift", type=int, choices=(2, 4, 8), default=0, help="Emit 2, 4 or 8 copies of each sprite pre-shifted right by 0-7 pixels")
+    parser.add_argument("--preshift_table", action="store_true", help="Add a DEFW shift-to-address table per pre-shifted sprite (implies --labels)")
+    parser.add_argument("--compress", choices=("rle", "lz", "auto"), help="Compress each sprite's bytes (auto = smaller of rle/lz per sprite)")
+    parser.add_argument("--anim-delta", type=parse_animations, nargs="?", const="rows", help="Store animation frames as XOR deltas of the frame before: every sprite row (default) or X:Y cell lists separated by /")
+    parser.add_argument("--verify_compression", action="store_true", help="Decode every compressed sprite and check it matches the original")
+    parser.add_argument("--watch", action="store_true", help="Rebuild -o/--binfile output whenever the PNG changes")
+    parser.add_argument("--watch_interval", type=float, default=0.5, help="Seconds between checks in --watch mode (default: 0.5)")
+    parser.add_argument("--stats", action="store_true", help="Report time, throughput and peak memory per stage (stderr)")
+    parser.add_argument("--stats_json", help="Write the --stats figures as JSON to this file")
+    parser.add_argument("--profile", help="Write a cProfile dump of the run to this file")
+    parser.add_argument("--batch", help="Convert a directory, glob pattern or manifest file of PNGs in parallel")
+    parser.add_argument("--jobs", type=int, default=0, help="Worker processes for --batch/--serve/--parallel (default: one per CPU)")
+    parser.add_argument("--parallel", action="store_true", help="Convert a single large sheet on several CPU cores (--jobs workers)")
+    parser.add_argument("--output_dir", help="Directory for --batch .asm/.bin output (default: next to each PNG)")
+    parser.add_argument("--serve", help="Run as a conversion server on a Unix socket path, or a [host:]port for HTTP")
+    parser.add_argument("--serve_cache_size", type=int, default=DEFAULT_IMAGE_CACHE_MB, help=f"Decoded-image cache per --serve worker in MB (default: {DEFAULT_IMAGE_CACHE_MB})")
+    parser.add_argument("--cache", action="store_true", help="Reuse results for unchanged sheets from the conversion cache")
+    parser.add_argument("--cache_dir", default=None, help="Conversion cache directory (default: ~/.cache/defb_generator)")
+    parser.add_argument("--cache_size", type=int, default=DEFAULT_CACHE_SIZE_MB, help=f"Conversion cache size cap in MB (default: {DEFAULT_CACHE_SIZE_MB})")
+    parser.add_argument("--cache_info", action="store_true", help="Show conversion cache usage and exit")
+    parser.add_argument("--cache_clear", action="store_true", help="Delete all conversion cache entries and exit")
+    return parser
+
+
+def normalise_args(args):
+    """
+    Apply the implied flag combinations to parsed arguments (in place).
+
+    Args:
+        args (argparse.Namespace): Parsed command-line arguments.
+
+    Returns:
+        argparse.Namespace: The same namespace, for convenience.
+    """
+    if args.mirror_align:
+        args.mirror = True
+
+    # It's a cludge for now...
+    if args.animate:
+        args.preview = True
+
+    if args.mirror:
+        args.mirror_align = True
+        #args.mirror = False
+
+    if args.preshift_table:
+        args.labels = True
+
+    if args.mask_outline and not args.mask:
+        args.mask = "interleaved"
+    return args
+
+
+def option_conflicts(args):
+    """
+    Check parsed arguments for option combinations the converter rejects.
+
+    Args:
+        args (argparse.Namespace): Parsed (and normalised) command-line arguments.
+
+    Returns:
+        str or None: Error message, or None when the options can be combined.
+    """
+    if args.anim_delta and (args.dedupe or args.dedupe_transforms or args.preshift):
+        return "--anim-delta cannot be combined with --dedupe or --preshift"
+    if args.screen and args.emit and not args.sprite_data:
+        return "--emit does not support --screen"
+    if args.parallel and sys.version_info < (3, 8):
+        return "--parallel needs Python 3.8 or newer (multiprocessing.shared_memory)"
+    return None
+
+
+def conversion_options(args):
+    """
+    Map parsed arguments onto ``convert_png_to_zx_defb_pypng`` keyword arguments.
+
+    Args:
+        args (argparse.Namespace): Parsed (and normalised) command-line arguments.
+
+    Returns:
+        dict: Keyword arguments for ``convert_png_to_zx_defb_pypng``.
+    """
+    return dict(
+        png_file=args.filename,
+        exclude_colour=args.exclude_colour,
+        sprite_width=args.sprite_width,
+        sprite_height=args.sprite_height,
+        gap_x=args.gap_x,
+        gap_y=args.gap_y,
+        offset_x=args.offset_x,
+        offset_y=args.offset_y,
+        use_hex=args.hex,
+        use_bin=args.bin,
+        use_labels=args.labels,
+        alpha_threshold=args.alpha_threshold,
+        preview_ascii=args.preview,
+        exclude_tolerance=args.exclude_tolerance,
+        inverse=args.inverse,
+        mirror=args.mirror,
+        mirror_align=args.mirror_align,
+        flip_vertical=args.flip_vertical,
+        use_numpy=False if args.no_numpy else None,
+        dedupe=args.dedupe,
+        dedupe_transforms=args.dedupe_transforms,
+        preshift=args.preshift,
+        preshift_table=args.preshift_table,
+        compress=args.compress,
+        verify_compression=args.verify_compression,
+        rows=args.rows,
+        cols=args.cols,
+        cells=args.cells,
+        mask=args.mask,
+        mask_outline=args.mask_outline,
+        anim_delta=args.anim_delta,
+        workers=(args.jobs or os.cpu_count() or 1) if args.parallel else 0
+    )
+
+
+def emit_targets(args):
+    """
+    Resolve the ``--emit`` formats to output paths.
+
+    Formats given without a path are named after the ``-o`` file (or the PNG)
+    with the ``OUTPUT_FORMATS`` suffix, e.g. ``sprites.png`` -> ``sprites.h``.
+
+    Args:
+        args (argparse.Namespace): Parsed command-line arguments.
+
+    Returns:
+        list of tuple: (format, path) pairs, in the order given.
+
+    Raises:
+        ValueError: If an --emit path would overwrite -o, --binfile or another --emit file.
+    """
+    targets = []
+    seen = {os.path.abspath(path) for path in (args.output, args.binfile) if path}
+    for fmt, path in args.emit or ():
+        if path is None:
+            stem = os.path.splitext(args.output or args.filename)[0]
+            path = stem + OUTPUT_FORMATS[fmt]
+        if os.path.abspath(path) in seen:
+            raise ValueError(f"--emit {fmt} would overwrite '{path}'")
+        seen.add(os.path.abspath(path))
+        targets.append((fmt, path))
+    return targets
+
+
+def default_cache_dir():
+    """Return the conversion cache directory ($DEFB_CACHE_DIR or the user cache folder)."""
+    if os.environ.get("DEFB_CACHE_DIR"):
+        return os.environ["DEFB_CACHE_DIR"]
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "defb_generator")
+
+
+def cache_key(options):
+    """
+    Build a content-addressed cache key for one conversion.
+
+    The key covers the PNG file contents plus every option that affects the
+    output; the file name, backend choice and worker count do not, since they
+    never change the generated bytes.
+
+    Args:
+        options (dict): Keyword arguments for ``convert_png_to_zx_defb_pypng``.
+
+    Returns:
+        str: Hex SHA-256 digest.
+    """
+    digest = hashlib.sha256()
+    with open(options["png_file"], "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    settings = {k: v for k, v in options.items() if k not in ("png_file", "use_numpy", "workers")}
+    settings["cache_format_version"] = CACHE_FORMAT_VERSION
+    digest.update(json.dumps(settings, sort_keys=True).encode("utf-8"))
+    return digest.hexdigest()
+
+
+def _cache_entries(cache_dir):
+    """Return (key, last used time, size in bytes) for every complete cache entry."""
+    entries = []
+    if not os.path.isdir(cache_dir):
+        return entries
+    for name in os.listdir(cache_dir):
+        if not name.endswith(".json"):
+            continue
+        key = name[:-5]
+        try:
+            meta_stat = os.stat(os.path.join(cache_dir, name))
+            bin_size = os.path.getsize(os.path.join(cache_dir, key + ".bin"))
+        except OSError:
+            continue
+        entries.append((key, meta_stat.st_mtime, meta_stat.st_size + bin_size))
+    return entries
+
+
+def _remove_cache_entry(cache_dir, key):
+    """Delete one cache entry, ignoring files another process already removed."""
+    for suffix in (".json", ".bin"):
+        try:
+            os.remove(os.path.join(cache_dir, key + suffix))
+        except FileNotFoundError:
+            pass
+
+
+def evict_cache(cache_dir, max_bytes):
+    """
+    Remove least recently used entries until the cache fits in ``max_bytes``.
+
+    Args:
+        cache_dir (str): Cache directory.
+        max_bytes (int): Size cap in bytes.
+    """
+    entries = sorted(_cache_entries(cache_dir), key=lambda entry: entry[1])
+    total = sum(entry[2] for entry in entries)
+    for key, _, size in entries:
+        if total <= max_bytes:
+            break
+        _remove_cache_entry(cache_dir, key)
+        total -= size
+
+
+def cached_convert(options, cache_dir=None, max_bytes=DEFAULT_CACHE_SIZE_MB * 1024 * 1024, report=None, stats=None):
+    """
+    Run ``convert_png_to_zx_defb_pypng`` through the on-disk conversion cache.
+
+    A hit serves the DEFB text, binary and ASCII blocks straight from disk and
+    marks the entry as recently used; a miss converts, stores the result and
+    evicts old entries beyond the size cap.
+
+    Args:
+        options (dict): Keyword arguments for ``convert_png_to_zx_defb_pypng``.
+        cache_dir (str, optional): Cache directory (default: ``default_cache_dir()``).
+        max_bytes (int): Size cap in bytes.
+        report (dict, optional): Filled with the conversion report, cached alongside the output.
+        stats (StageStats, optional): Collects per-stage timings ("cache" for the lookup).
+
+    Returns:
+        tuple: Same as ``convert_png_to_zx_defb_pypng``.
+    """
+    cache_dir = cache_dir or default_cache_dir()
+    meta_path = bin_path = None
+
+    with stage_timer(stats)("cache"):
+        try:
+            key = cache_key(options)
+            meta_path = os.path.join(cache_dir, key + ".json")
+            bin_path = os.path.join(cache_dir, key + ".bin")
+            with open(meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            with open(bin_path, "rb") as f:
+                binary_data = f.read()
+            os.utime(meta_path)
+            if report is not None:
+                report.update(meta.get("report", {}))
+            return meta["asm"], binary_data, meta["ascii"]
+        except (OSError, ValueError, KeyError):
+            pass
+
+    conversion_report = {}
+    asm_output, binary_data, ascii_blocks = convert_png_to_zx_defb_pypng(
+        **options, report=conversion_report, stats=stats
+    )
+    if report is not None:
+        report.update(conversion_report)
+
+    # Write the .bin first; the .json appearing marks the entry as complete.
+    os.makedirs(cache_dir, exist_ok=True)
+    for path, mode, data in (
+        (bin_path, "wb", binary_data),
+        (meta_path, "w", json.dumps({"asm": asm_output, "ascii": ascii_blocks, "report": conversion_report})),
+    ):
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, mode, **({} if "b" in mode else {"encoding": "utf-8"})) as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    evict_cache(cache_dir, max_bytes)
+    return asm_output, binary_data, ascii_blocks
+
+
+def print_cache_info(cache_dir, max_bytes):
+    """Print the number of entries and space used by the conversion cache."""
+    entries = _cache_entries(cache_dir)
+    total = sum(entry[2] for entry in entries)
+    print(f"Cache directory: {cache_dir}")
+    print(f"Entries: {len(entries)}")
+    print(f"Size: {total / (1024 * 1024):.2f} MB of {max_bytes / (1024 * 1024):.0f} MB")
+    if entries:
+        newest = max(entry[1] for entry in entries)
+        print(f"Last used: {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(newest))}")
+
+
+def clear_cache(cache_dir):
+    """
+    Delete every entry in the conversion cache.
+
+    Returns:
+        int: Number of entries removed.
+    """
+    entries = _cache_entries(cache_dir)
+    for key, _, _ in entries:
+        _remove_cache_entry(cache_dir, key)
+    return len(entries)
+
+
+def run_conversion(args, report=None, stats=None):
+    """
+    Convert the sheet described by parsed arguments, using the cache when enabled.
+
+    Args:
+        args (argparse.Namespace): Parsed (and normalised) command-line arguments.
+        report (dict, optional): Filled with the conversion report.
+        stats (StageStats, optional): Collects per-stage timings.
+
+    Returns:
+        tuple: Same as ``convert_png_to_zx_defb_pypng``.
+    """
+    options = conversion_options(args)
+    if args.cache:
+        return cached_convert(options, args.cache_dir, args.cache_size * 1024 * 1024, report=report, stats=stats)
+    return convert_png_to_zx_defb_pypng(**options, report=report, stats=stats)
+
+
+@contextlib.contextmanager
+def atomic_output(path, mode="w"):
+    """
+    Open an output file so that a failed conversion leaves the old one intact.
+
+    Regular files (and new paths) are written to a temporary file in the
+    target's directory, which replaces the target on success and is deleted
+    on failure. Symlinks are followed, so the link's target is updated.
+    Non-regular targets such as ``/dev/null`` or ``/dev/stdout`` are written
+    directly.
+
+    Args:
+        path (str): Final output path.
+        mode (str): "w" for text (UTF-8) or "wb" for binary.
+
+    Yields:
+        file: Buffered handle to write to.
+    """
+    encoding = None if "b" in mode else "utf-8"
+    real_path = os.path.realpath(path)
+    if os.path.exists(real_path) and not os.path.isfile(real_path):
+        with open(path, mode, encoding=encoding, buffering=1 << 16) as f:
+            yield f
+        return
+
+    if os.path.exists(real_path):
+        permissions = stat.S_IMODE(os.stat(real_path).st_mode)
+    else:
+        umask = os.umask(0)
+        os.umask(umask)
+        permissions = 0o666 & ~umask
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(real_path), prefix=os.path.basename(real_path) + ".", suffix=".tmp")
+    try:
+        with open(fd, mode, encoding=encoding, buffering=1 << 16) as f:
+            yield f
+        os.chmod(tmp_path, permissions)
+        os.replace(tmp_path, real_path)
+    except BaseException:
+        with contextlib.suppress(OSError):
+            os.remove(tmp_path)
+        raise
+
+
+def stream_conversion(args, report=None, stats=None, collect_ascii=False):
+    """
+    Convert a sheet and stream the listing and binary straight to their outputs.
+
+    The listing goes to ``args.output`` (stdout when not set) and the binary to
+    ``args.binfile`` through buffered handles, sprite by sprite, so memory stays
+    flat however many sprites the sheet holds. Each ``--emit`` format gets its
+    own sink on the same record stream, so the sheet is decoded and packed
+    once however many formats are written; with ``--emit`` and no ``-o`` the
+    listing is not printed. With ``--cache`` (and no ``--emit``) the cached
+    (or freshly cached) result is written out instead. Files are written via
+    ``atomic_output``, so a failed conversion leaves earlier outputs intact.
+
+    Args:
+        args (argparse.Namespace): Parsed (and normalised) command-line arguments.
+        report (dict, optional): Filled with the conversion report.
+        stats (StageStats, optional): Collects per-stage timings.
+        collect_ascii (bool): Also return every sprite's ASCII preview block.
+
+    Returns:
+        tuple: (bytes of binary output, list of ASCII blocks).
+    """
+    report = report if report is not None else {}
+    targets = emit_targets(args)
+    with contextlib.ExitStack() as stack:
+        if args.output:
+            defb_file = stack.enter_context(atomic_output(args.output, "w"))
+        elif targets:
+            defb_file = None
+        else:
+            defb_file = sys.stdout
+        bin_file = stack.enter_context(atomic_output(args.binfile, "wb")) if args.binfile else None
+
+        if args.cache and not targets:
+            asm_output, binary_data, ascii_blocks = run_conversion(args, report, stats)
+            with stage_timer(stats)("write"):
+                defb_file.write(asm_output)
+                if bin_file:
+                    bin_file.write(binary_data)
+            size = len(binary_data)
+        else:
+            options = conversion_options(args)
+            extra_sinks = [
+                make_format_sink(
+                    fmt, stack.enter_context(atomic_output(path, "wb" if fmt == "bin" else "w")), options, path, stats
+                )
+                for fmt, path in targets
+            ]
+            format_options = [
+                options.pop(name) for name in ("use_hex", "use_bin", "use_labels", "preview_ascii", "preshift_table")
+            ]
+            format_options.append(options["mask"])
+            records = iter_sprite_records(
+                **options, want_ascii=format_options[3] or collect_ascii, report=report, stats=stats
+            )
+            binary_sink = BinarySink(bin_file or io.BytesIO(), stats)
+            ascii_sink = AsciiSink()
+            sinks = [binary_sink] + extra_sinks
+            if defb_file is not None:
+                sinks.insert(0, DefbSink(defb_file, *format_options, stats=stats))
+            if collect_ascii:
+                sinks.append(ascii_sink)
+            write_sprite_records(records, sinks, report)
+            size, ascii_blocks = binary_sink.size, ascii_sink.blocks
+
+        if defb_file is sys.stdout:
+            defb_file.write("\n")
+    return size, ascii_blocks
+
+
+def report_stats(stats, profiler, args):
+    """
+    Print and/or save the --stats figures and write the --profile dump.
+
+    Args:
+        stats (StageStats or None): Collected stage statistics.
+        profiler (cProfile.Profile or None): Running profiler.
+        args (argparse.Namespace): Parsed command-line arguments.
+    """
+    if profiler is not None:
+        profiler.disable()
+        profiler.dump_stats(args.profile)
+        print(f"Profile written to {args.profile}", file=sys.stderr)
+    if stats is None:
+        return
+    if args.stats:
+        stats.print_table()
+    if args.stats_json:
+        with open(args.stats_json, "w", encoding="utf-8") as f:
+            json.dump(stats.summary(), f, indent=2)
+        print(f"Stats written to {args.stats_json}", file=sys.stderr)
+
+
+class IncrementalSheet:
+    """
+    Conversion state for --watch: the packed bytes and DEFB block of every cell.
+
+    ``update()`` re-decodes the sheet, hashes each cell's raw pixels and only
+    re-packs and re-formats cells whose hash changed since the last update.
+    A change of size, colour type, palette or transparent colour rebuilds
+    every cell.
+    """
+
+    def __init__(self, options):
+        """
+        Args:
+            options (dict): Keyword arguments for ``convert_png_to_zx_defb_pypng``.
+        """
+        self.options = options
+        self.layout = None
+        self.cells = []       # (pixel digest, flat_bytes, ascii_lines, listing lines) per sprite
+        self.bytes_per_sprite = 0
+
+    def update(self):
+        """
+        Bring the per-cell state up to date with the PNG on disk.
+
+        Returns:
+            tuple: (list of changed sprite indexes, bool layout_changed).
+        """
+        options = self.options
+        sprite_width, sprite_height = options["sprite_width"], options["sprite_height"]
+        reader = png.Reader(options["png_file"])
+        width, height, pixels, meta = reader.read()
+        planes = meta["planes"]
+
+        xs, ys = sprite_grid(
+            width, height, sprite_width, sprite_height,
+            options["gap_x"], options["gap_y"], options["offset_x"], options["offset_y"]
+        )
+        # Palette and tRNS edits change how sample values classify without
+        # touching the samples hashed below, so they count as a layout change.
+        layout = (
+            width, height, planes, meta["bitdepth"], len(xs), len(ys),
+            meta.get("greyscale"), meta.get("alpha"),
+            tuple(tuple(entry) for entry in meta.get("palette") or ()), meta.get("transparent")
+        )
+        layout_changed = layout != self.layout
+        if layout_changed:
+            self.layout = layout
+            self.cells = [None] * (len(xs) * len(ys))
+            self.bytes_per_sprite = math.ceil(sprite_width / 8) * sprite_height
+
+        pack = make_sprite_packer(
+            width, meta, sprite_width, sprite_height, options["exclude_colour"],
+            options["exclude_tolerance"], options["alpha_threshold"], options["inverse"],
+            options["mirror"], options["mirror_align"], options["flip_vertical"],
+            options["use_numpy"], want_ascii=options["preview_ascii"]
+        )
+
+        changed = []
+        for y_sprite_index, band in iter_row_bands(pixels, ys, sprite_height):
+            dirty = []
+            for x_sprite_index, x_sprite in enumerate(xs):
+                start, end = x_sprite * planes, (x_sprite + sprite_width) * planes
+                hasher = hashlib.blake2b()
+                for row in band:
+                    hasher.update(memoryview(row)[start:end])
+                digest = hasher.digest()
+                sprite_index = y_sprite_index * len(xs) + x_sprite_index
+                cell = self.cells[sprite_index]
+                if cell is None or cell[0] != digest:
+                    dirty.append((x_sprite_index, digest))
+
+            dirty_xs = [xs[x_sprite_index] for x_sprite_index, _ in dirty]
+            packed = pack([(y_sprite_index, band)], dirty_xs)
+            for (x_sprite_index, digest), (_, _, flat_bytes, ascii_lines) in zip(dirty, packed):
+                sprite_index = y_sprite_index * len(xs) + x_sprite_index
+                lines = format_sprite_block(
+                    sprite_index, x_sprite_index, y_sprite_index, flat_bytes, ascii_lines, None,
+                    options["use_hex"], options["use_bin"], options["use_labels"], options["preview_ascii"]
+                )
+                self.cells[sprite_index] = (digest, flat_bytes, ascii_lines, lines)
+                changed.append(sprite_index)
+
+        return changed, layout_changed
+
+    def listing(self):
+        """Return the full DEFB listing, identical to ``convert_png_to_zx_defb_pypng``."""
+        return "\n".join(line for cell in self.cells for line in cell[3])
+
+    def binary(self):
+        """Return the full raw binary output."""
+        return b"".join(bytes(cell[1]) for cell in self.cells)
+
+    def patch_binary(self, bin_path, sprite_indexes):
+        """
+        Overwrite only the given sprites' bytes in an existing .bin file.
+
+        Args:
+            bin_path (str): Binary file written by an earlier update.
+            sprite_indexes (list of int): Sprites to rewrite.
+        """
+        with open(bin_path, "r+b") as bf:
+            for sprite_index in sprite_indexes:
+                bf.seek(sprite_index * self.bytes_per_sprite)
+                bf.write(bytes(self.cells[sprite_index][1]))
+
+
+def watch_sheet(args, interval=0.5):
+    """
+    Rebuild the DEFB listing and .bin whenever the PNG changes, until interrupted.
+
+    Only sprite cells whose pixels changed are re-packed; the .bin is patched
+    in place at their offsets. With --dedupe, --preshift, --compress, --mask or
+    a cell selector the whole sheet is re-converted, since the output layout
+    no longer maps one cell to one fixed-size block.
+
+    Args:
+        args (argparse.Namespace): Parsed (and normalised) command-line arguments.
+        interval (float): Seconds between checks of the file's modification time.
+    """
+    sheet = IncrementalSheet(conversion_options(args))
+    incremental = not (
+        args.dedupe or args.dedupe_transforms or args.preshift or args.compress or args.mask
+        or args.rows or args.cols or args.cells or args.anim_delta
+    )
+    last_mtime = None
+
+    print(f"Watching {args.filename} (press Ctrl+C to stop)")
+    try:
+        while True:
+            try:
+                mtime = os.stat(args.filename).st_mtime_ns
+            except FileNotFoundError:
+                mtime = None  # editors may briefly remove the file while saving
+
+            if mtime is not None and mtime != last_mtime:
+                last_mtime = mtime
+                start = time.perf_counter()
+                try:
+                    if incremental:
+                        changed, layout_changed = sheet.update()
+                        full = layout_changed or not (args.binfile and os.path.isfile(args.binfile))
+                        if args.output and changed:
+                            with open(args.output, "w", encoding="utf-8") as f:
+                                f.write(sheet.listing())
+                        if args.binfile and changed:
+                            if full:
+                                with open(args.binfile, "wb") as bf:
+                                    bf.write(sheet.binary())
+                            else:
+                                sheet.patch_binary(args.binfile, changed)
+                        summary = f"{len(changed)} of {len(sheet.cells)} sprites rebuilt"
+                    else:
+                        asm_output, binary_data, _ = run_conversion(args)
+                        if args.output:
+                            with open(args.output, "w", encoding="utf-8") as f:
+                                f.write(asm_output)
+                        if args.binfile:
+                            with open(args.binfile, "wb") as bf:
+                                bf.write(binary_data)
+                        summary = "full rebuild"
+                except Exception as e:
+                    # Usually a half-written PNG; the next save triggers another attempt.
+                    print(f"⚠️ Warning: Rebuild failed - {type(e).__name__}: {e}")
+                    continue
+                print(f"[{time.strftime('%H:%M:%S')}] {summary} in {time.perf_counter() - start:.3f}s")
+
+            time.sleep(interval)
+    except KeyboardInterrupt:
+        print("\nWatch stopped.")
+
+
+def collect_batch_jobs(source, base_args, parser):
+    """
+    Expand a directory, glob pattern or manifest file into per-sheet jobs.
+
+    Directories and glob patterns use the options given on the command line
+    for every sheet. A manifest is a text file with one sheet per line, written
+    exactly like the command line (``sheet.png --sprite_width 16 --hex``);
+    options on a line override the command-line ones. Blank lines and lines
+    starting with ``#`` are ignored. Command-line ``--emit`` formats are
+    written next to each sheet's ``.asm``; only a manifest line may give an
+    ``--emit`` path, since one path would be shared by every sheet.
+
+    Args:
+        source (str): Directory, glob pattern or manifest path.
+        base_args (argparse.Namespace): Command-line options used as defaults.
+        parser (argparse.ArgumentParser): Parser used for manifest lines.
+
+    Returns:
+        list of argparse.Namespace: One normalised namespace per sheet.
+    """
+    defaults = copy.copy(base_args)
+    defaults.filename = None
+    defaults.output = None
+    defaults.binfile = None
+    if any(path for _, path in base_args.emit or ()):
+        print("⚠️ Warning: --emit paths are ignored with --batch; each sheet's files are named after its .asm.")
+    defaults.emit = [(fmt, None) for fmt, _ in base_args.emit or ()] or None
+
+    if os.path.isdir(source):
+        files = sorted(
+            os.path.join(source, name) for name in os.listdir(source) if name.lower().endswith(".png")
+        )
+    elif os.path.isfile(source):
+        jobs = []
+        with open(source, "r", encoding="utf-8") as f:
+            for line_number, line in enumerate(f, 1):
+                line = line.strip()
+                if not line or line.startswith("#"):
+                    continue
+                try:
+                    job = parser.parse_args(shlex.split(line), namespace=copy.copy(defaults))
+                except SystemExit:
+                    print(f"❌ Error: Invalid manifest entry at {source}:{line_number}")
+                    sys.exit(1)
+                jobs.append(normalise_args(job))
+        return jobs
+    else:
+        files = sorted(glob.glob(source))
+
+    jobs = []
+    for filename in files:
+        job = copy.copy(defaults)
+        job.filename = filename
+        jobs.append(job)
+    return jobs
+
+
+def _run_batch_job(job):
+    """
+    Convert one sheet of a batch and write its .asm/.bin pair (process pool worker).
+
+    Args:
+        job (argparse.Namespace): Normalised options for this sheet.
+
+    Returns:
+        tuple: (filename, seconds taken, bytes of sprite data, error message or None).
+    """
+    start = time.perf_counter()
+    try:
+        stem = os.path.splitext(os.path.basename(job.filename))[0]
+        out_dir = job.output_dir or os.path.dirname(job.filename)
+        job = copy.copy(job)
+        job.parallel = False  # sheets already run in parallel
+        job.output = job.output or os.path.join(out_dir, stem + ".asm")
+        job.binfile = job.binfile or os.path.join(out_dir, stem + ".bin")
+        conflict = option_conflicts(job)
+        if conflict:
+            raise ValueError(conflict)
+
+        if job.screen:
+            size = run_screen_conversion(job)
+        else:
+            size, _ = stream_conversion(job)
+        return job.filename, time.perf_counter() - start, size, None
+    except Exception as e:
+        return job.filename, time.perf_counter() - start, 0, f"{type(e).__name__}: {e}"
+
+
+def run_batch(jobs, workers=0):
+    """
+    Convert a list of sheets over a process pool and print a timing summary.
+
+    Args:
+        jobs (list of argparse.Namespace): Jobs from ``collect_batch_jobs``.
+        workers (int): Number of worker processes (0 = one per CPU).
+
+    Returns:
+        int: Number of sheets that failed.
+    """
+    if not jobs:
+        print("⚠️ Warning: No PNG files found for batch conversion.")
+        return 0
+
+    for out_dir in {job.output_dir for job in jobs if job.output_dir}:
+        os.makedirs(out_dir, exist_ok=True)
+
+    start = time.perf_counter()
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers or None) as pool:
+        results = list(pool.map(_run_batch_job, jobs))
+    total = time.perf_counter() - start
+
+    failures = [result for result in results if result[3]]
+    print(f"\n{'Status':<8}{'Seconds':>9}{'Bytes':>10}  File")
+    for filename, seconds, size, error in results:
+        status = "FAILED" if error else "OK"
+        print(f"{status:<8}{seconds:>9.3f}{size:>10}  {filename}")
+        if error:
+            print(f"{'':<8}{'':>9}{'':>10}  {error}")
+    print(f"\n{len(results) - len(failures)} converted, {len(failures)} failed in {total:.3f}s")
+    return len(failures)
+
+
+_server_image_cache = None
+
+
+def _init_server_worker(max_bytes):
+    """Give each server worker process its own decoded-image cache."""
+    global _server_image_cache
+    _server_image_cache = DecodedImageCache(max_bytes)
+
+
+def _run_server_job(argv, png_data=None):
+    """
+    Run one server conversion request (process pool worker).
+
+    Args:
+        argv (list of str): Command-line style options, optionally starting with the PNG path.
+        png_data (bytes, optional): PNG contents, used instead of a path.
+
+    Returns:
+        dict: JSON-ready response with the listing, base64 binary and report, or an error.
+    """
+    start = time.perf_counter()
+    errors = io.StringIO()
+    try:
+        with contextlib.redirect_stderr(errors):
+            args = build_arg_parser().parse_args(argv)
+    except SystemExit:
+        return {"ok": False, "error": errors.getvalue().strip().splitlines()[-1] if errors.getvalue() else "invalid arguments"}
+
+    args = normalise_args(args)
+    args.parallel = False  # requests already run on the server's pool
+    args.emit = None  # results go back in the reply
+    if png_data is not None:
+        args.filename = png_data
+    elif not args.filename:
+        return {"ok": False, "error": "no PNG path or data given"}
+
+    try:
+        report = {}
+        asm_output, binary_data, _ = convert_png_to_zx_defb_pypng(
+            **conversion_options(args), image_cache=_server_image_cache, report=report
+        )
+    except Exception as e:
+        return {"ok": False, "error": f"{type(e).__name__}: {e}"}
+    return {
+        "ok": True,
+        "asm": asm_output,
+        "bin": base64.b64encode(binary_data).decode("ascii"),
+        "report": report,
+        "seconds": round(time.perf_counter() - start, 6),
+        "image_cache": {"hits": _server_image_cache.hits, "misses": _server_image_cache.misses},
+    }
+
+
+def handle_server_request(pool, request):
+    """
+    Run a decoded JSON request on the worker pool and wait for the answer.
+
+    A request is ``{"args": "sheet.png --sprite_width 16 --hex"}``; ``args`` may
+    also be a list of strings and numbers. ``"png"`` may carry the PNG as
+    base64 instead of a path. Any failure, including a malformed request,
+    comes back as an error response so the connection stays usable.
+
+    Args:
+        pool (concurrent.futures.Executor): Worker pool.
+        request: Decoded request.
+
+    Returns:
+        dict: Response from ``_run_server_job``, or ``{"ok": False, "error": ...}``.
+    """
+    try:
+        if not isinstance(request, dict):
+            return {"ok": False, "error": "request must be a JSON object"}
+        argv = request.get("args", [])
+        if isinstance(argv, str):
+            argv = shlex.split(argv)
+        elif not isinstance(argv, list) or not all(
+            isinstance(arg, (str, int, float)) and not isinstance(arg, bool) for arg in argv
+        ):
+            return {"ok": False, "error": "args must be a string or a list of strings/numbers"}
+        png = request.get("png")
+        if png is not None and not isinstance(png, str):
+            return {"ok": False, "error": "png must be a base64 string"}
+        try:
+            png_data = base64.b64decode(png, validate=True) if png else None
+        except ValueError:
+            return {"ok": False, "error": "png is not valid base64"}
+        return pool.submit(_run_server_job, [str(arg) for arg in argv], png_data).result()
+    except Exception as e:
+        return {"ok": False, "error": f"{type(e).__name__}: {e}"}
+
+
+class ConversionHTTPHandler(http.server.BaseHTTPRequestHandler):
+    """HTTP front end for ``--serve``: POST a JSON request, get a JSON response."""
+
+    def _send_json(self, status, body):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        self._send_json(200, {"ok": True, "workers": self.server.workers})
+
+    def do_POST(self):
+        try:
+            request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+        except ValueError:
+            self._send_json(400, {"ok": False, "error": "request body is not valid JSON"})
+            return
+        response = handle_server_request(self.server.pool, request)
+        self._send_json(200 if response["ok"] else 400, response)
+
+
+class ConversionSocketHandler(socketserver.StreamRequestHandler):
+    """Unix socket front end for ``--serve``: one JSON request per line, one JSON response per line."""
+
+    def handle(self):
+        for line in self.rfile:
+            if not line.strip():
+                continue
+            try:
+                response = handle_server_request(self.server.pool, json.loads(line))
+            except ValueError:
+                response = {"ok": False, "error": "request is not valid JSON"}
+            self.wfile.write(json.dumps(response).encode("utf-8") + b"\n")
+            self.wfile.flush()
+
+
+def parse_serve_address(address):
+    """
+    Split a --serve address into ("http", (host, port)) or ("unix", path).
+
+    ``8080`` and ``host:8080`` listen for HTTP (host defaults to 127.0.0.1);
+    anything else is a Unix socket path.
+    """
+    host, _, port = address.rpartition(":")
+    if port.isdigit():
+        return "http", (host or "127.0.0.1", int(port))
+    return "unix", address
+
+
+def serve(address, workers=0, cache_bytes=DEFAULT_IMAGE_CACHE_MB * 1024 * 1024):
+    """
+    Keep the converter warm and answer conversion requests until interrupted.
+
+    Each connection is handled on its own thread; conversions run on a process
+    pool whose workers each keep a ``DecodedImageCache``.
+
+    Args:
+        address (str): Port, ``host:port`` (HTTP) or Unix socket path.
+        workers (int): Worker processes (0 = one per CPU).
+        cache_bytes (int): Decoded-image cache size per worker, in bytes.
+    """
+    kind, bind = parse_serve_address(address)
+    if kind == "unix":
+        if not hasattr(socketserver, "ThreadingUnixStreamServer"):
+            print("❌ Error: Unix sockets are not available on this platform, use a port instead.")
+            sys.exit(1)
+        if os.path.exists(bind):
+            if not stat.S_ISSOCK(os.stat(bind).st_mode):
+                print(f"❌ Error: '{bind}' exists and is not a socket; choose another --serve path.")
+                sys.exit(1)
+            os.remove(bind)  # stale socket from an earlier run
+        server = socketserver.ThreadingUnixStreamServer(bind, ConversionSocketHandler)
+    else:
+        server = http.server.ThreadingHTTPServer(bind, ConversionHTTPHandler)
+    server.daemon_threads = True
+
+    workers = workers or os.cpu_count() or 1
+    with concurrent.futures.ProcessPoolExecutor(
+        max_workers=workers, initializer=_init_server_worker, initargs=(cache_bytes,)
+    ) as pool:
+        server.pool = pool
+        server.workers = workers
+        where = bind if kind == "unix" else f"http://{bind[0]}:{bind[1]}/"
+        print(f"Serving conversions on {where} with {server.workers} workers (Ctrl+C to stop)")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            print("\nServer stopped.")
+        finally:
+            server.server_close()
+            if kind == "unix" and os.path.exists(bind) and stat.S_ISSOCK(os.stat(bind).st_mode):
+                os.remove(bind)
+
+
+def request_conversion(address, args, png_data=None, timeout=None):
+    """
+    Send one conversion request to a running ``--serve`` process.
+
+    Args:
+        address (str): The address the server was started with.
+        args (str or list): Options as on the command line, optionally starting with the PNG path.
+        png_data (bytes, optional): PNG contents to convert instead of a path.
+        timeout (float, optional): Socket timeout in seconds.
+
+    Returns:
+        dict: Server response; on success ``"bin"`` is decoded to bytes.
+    """
+    request = {"args": args}
+    if png_data is not None:
+        request["png"] = base64.b64encode(png_data).decode("ascii")
+    payload = json.dumps(request).encode("utf-8")
+
+    kind, bind = parse_serve_address(address)
+    if kind == "unix":
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(timeout)
+            sock.connect(bind)
+            sock.sendall(payload + b"\n")
+            with sock.makefile("rb") as f:
+                response = json.loads(f.readline())
+    else:
+        http_request = urllib.request.Request(
+            f"http://{bind[0]}:{bind[1]}/", data=payload, headers={"Content-Type": "application/json"}
+        )
+        try:
+            with urllib.request.urlopen(http_request, timeout=timeout) as f:
+                response = json.loads(f.read())
+        except urllib.error.HTTPError as e:
+            response = json.loads(e.read())
+
+    if response.get("ok"):
+        response["bin"] = base64.b64decode(response["bin"])
+    return response
+
+
+def main():
+    """
+    Entry point for the ZX Spectrum sprite tool.
+
+    Parses command-line arguments and executes the appropriate rendering logic.
+    """
+    parser = build_arg_parser()
+    args = parser.parse_args()
+
+    if args.cache_info or args.cache_clear:
+        cache_dir = args.cache_dir or default_cache_dir()
+        if args.cache_clear:
+            print(f"Removed {clear_cache(cache_dir)} cache entries from {cache_dir}")
+        if args.cache_info:
+            print_cache_info(cache_dir, args.cache_size * 1024 * 1024)
+        return
+
+    if args.serve:
+        serve(args.serve, args.jobs, args.serve_cache_size * 1024 * 1024)
+        return
+
+    if args.batch:
+        jobs = collect_batch_jobs(args.batch, normalise_args(args), parser)
+        sys.exit(1 if run_batch(jobs, workers=args.jobs) else 0)
+
+    # If BIN File, then PNG File is not required...
+    # Another cludge but will work for now.. 
+
+    if not args.sprite_data:
+        if not os.path.isfile(args.filename):
+            print(f"❌ Error: File not found - '{args.filename}'")
+            sys.exit(1)
+
+        if not args.filename.lower().endswith(".png"):
+            print(f"⚠️ Warning: '{args.filename}' does not appear to be a .png file.")
+
+    normalise_args(args)
+    conflict = option_conflicts(args)
+    if conflict:
+        print(f"❌ Error: {conflict}")
+        sys.exit(1)
+
+    if args.watch and not args.sprite_data:
+        if args.screen or args.emit:
+            print(f"❌ Error: --watch does not support {'--screen' if args.screen else '--emit'}.")
+            sys.exit(1)
+        if not (args.output or args.binfile):
+            print("❌ Error: --watch needs an output file (-o and/or --binfile).")
+            sys.exit(1)
+        watch_sheet(args, interval=args.watch_interval)
+        return
+
+    stats = StageStats() if (args.stats or args.stats_json) else None
+    stage = stage_timer(stats)
+    profiler = None
+    if args.profile:
+        profiler = cProfile.Profile()
+        profiler.enable()
+
+    if args.screen and not args.sprite_data:
+        size = run_screen_conversion(args, stats)
+        if args.binfile:
+            print(f"Screen ({size} bytes) written to {args.binfile}")
+        if args.output:
+            print(f"DEFB output written to {args.output}")
+        report_stats(stats, profiler, args)
+        return
+
+    if args.sprite_data:
         if not os.path.isfile(args.sprite_data):
             print(f"\u274c Error: BIN file not found - '{args.sprite_data}'")
             sys.exit(1)
-        with open(args.sprite_data, "rb") as f:
-            sprite_bytes = f.read()
-        
+        with stage("load"):
+            sprite_bytes = load_sprite_bank(args.sprite_data)
+        if args.compress:
+            with stage("decompress"):
+                sprite_bytes = decompress_bank(sprite_bytes, args.compress)
+
         if args.sprite_width % 8 != 0:
             adjusted_width = ((args.sprite_width + 7) // 8) * 8
             print(f"\u26A0\ufe0f Warning: Sprite width {args.sprite_width} not byte-aligned. Adjusted to {adjusted_width}.")
             args.sprite_width = adjusted_width
 
-        image = render_spectrum_bin_to_image(
-            sprite_data=sprite_bytes,
-            sprite_width=args.sprite_width,
-            sprite_height=args.sprite_height,
-            texture_width=args.max_texture_width
-        )
+        if stats is not None and (args.bin_output_png or (args.preview and not args.animate)):
+            total_sprites, sprites_per_row, sprites_per_column = bin_sheet_layout(
+                sprite_bytes, args.sprite_width, args.sprite_height, args.max_texture_width
+            )
+            stats.count("pixels", sprites_per_row * args.sprite_width * sprites_per_column * args.sprite_height)
+            stats.count("sprites", total_sprites)
         if args.bin_output_png:
-            write_image_to_png(image, args.bin_output_png)
+            # Rendered and written a scanline at a time.
+            with stage("write"):
+                write_spectrum_bin_png(
+                    sprite_data=sprite_bytes,
+                    sprite_width=args.sprite_width,
+                    sprite_height=args.sprite_height,
+                    output_filename=args.bin_output_png,
+                    texture_width=args.max_texture_width
+                )
             print(f"\u2705 PNG image written to {args.bin_output_png}")
-        if args.preview:
-            print("\nASCII Preview:\n")
-            print(ascii_preview_from_image(image))
+
+        # Only build the full sheet image when the preview needs it.
+        if args.preview and not args.animate:
+            with stage("render"):
+                image = render_spectrum_bin_to_image(
+                    sprite_data=sprite_bytes,
+                    sprite_width=args.sprite_width,
+                    sprite_height=args.sprite_height,
+                    texture_width=args.max_texture_width
+                )
+            with stage("preview"):
+                print("\nASCII Preview:\n")
+                print(ascii_preview_from_image(image))
+
+        report_stats(stats, profiler, args)
 
         if args.animate:
             frames = render_spectrum_bin_to_frames(
@@ -532,38 +3965,25 @@ def main():
             #animate_ascii_frames(frames)
             return
     else:
-        asm_output, binary_data, ascii_blocks = convert_png_to_zx_defb_pypng(
-            png_file=args.filename,
-            exclude_colour=args.exclude_colour,
-            sprite_width=args.sprite_width,
-            sprite_height=args.sprite_height,
-            gap_x=args.gap_x,
-            gap_y=args.gap_y,
-            offset_x=args.offset_x,
-            offset_y=args.offset_y,
-            use_hex=args.hex,
-            use_bin=args.bin,
-            use_labels=args.labels,
-            alpha_threshold=args.alpha_threshold,
-            preview_ascii=args.preview,
-            exclude_tolerance=args.exclude_tolerance,
-            inverse=args.inverse,
-            mirror=args.mirror,
-            mirror_align=args.mirror_align,
-            flip_vertical=args.flip_vertical
-        )
+        report = {}
+        try:
+            _, ascii_blocks = stream_conversion(args, report, stats, collect_ascii=args.animate)
+        except ValueError as e:
+            print(f"\u274c Error: {e}")
+            sys.exit(1)
 
         if args.output:
-            with open(args.output, "w", encoding="utf-8") as f:
-                f.write(asm_output)
             print(f"DEFB output written to {args.output}")
-        else:
-            print(asm_output)
-
+            if "dedupe" in report:
+                print(dedupe_summary(report["dedupe"]).lstrip("; "))
+            if "compression" in report:
+                print(compression_summary(report["compression"]).lstrip("; "))
         if args.binfile:
-            with open(args.binfile, "wb") as bf:
-                bf.write(binary_data)
             print(f"Binary output written to {args.binfile}")
+        for fmt, path in emit_targets(args):
+            print(f"{fmt} output written to {path}")
+
+        report_stats(stats, profiler, args)
 
         if args.animate:
             animate_ascii_preview(ascii_blocks, delay=args.delay)
@@ -0,0 +1,112 @@
+"""
+Regression tests for the ZX Spectrum Sprite Sheet to DEFB Converter.
+
+Run with ``python -m pytest -q``.
+"""
+import random
+
+import png
+import pytest
+
+import DEFB_GeneratorV3 as defb
+
+
+def write_sheet(path, cells, sprite_size=8):
+    """
+    Write a one-row greyscale sheet from a list of sprite cells.
+
+    Args:
+        path (str): Output PNG filename.
+        cells (list): One ``sprite_size`` x ``sprite_size`` grid of 0/1 per sprite.
+        sprite_size (int): Sprite width and height in pixels.
+    """
+    rows = [
+        [255 if cell[y][x] else 0 for cell in cells for x in range(sprite_size)]
+        for y in range(sprite_size)
+    ]
+    with open(path, "wb") as f:
+        png.Writer(len(cells) * sprite_size, sprite_size, greyscale=True, bitdepth=8).write(f, rows)
+
+
+def random_cell(rng, sprite_size=8):
+    return [[rng.getrandbits(1) for _ in range(sprite_size)] for _ in range(sprite_size)]
+
+
+@pytest.mark.parametrize("options", [
+    {},
+    {"preshift": 4, "mask": "interleaved"},
+    {"mask": "interleaved", "compress": "lz"},
+    {"mask": "interleaved", "compress": "auto"},
+    {"preshift": 2, "mask": "planes", "mask_outline": True, "compress": "auto"},
+])
+def test_dedupe_summary_matches_bin_size(tmp_path, options):
+    rng = random.Random(7)
+    cells = []
+    for _ in range(6):
+        cell = random_cell(rng)
+        cells += [cell, [row[::-1] for row in cell], cell[::-1]]
+    sheet = str(tmp_path / "sheet.png")
+    write_sheet(sheet, cells)
+
+    report = {}
+    _, deduped, _ = defb.convert_png_to_zx_defb_pypng(
+        sheet, sprite_width=8, sprite_height=8, dedupe_transforms=True, report=report, **options
+    )
+    _, full, _ = defb.convert_png_to_zx_defb_pypng(sheet, sprite_width=8, sprite_height=8, **options)
+
+    assert report["dedupe"]["aliased"] > 0
+    assert report["dedupe"]["bytes_saved"] == len(full) - len(deduped)
+
+
+def play_animation(data, frame_size, frames):
+    """Rebuild every frame of one animation from its first frame and delta streams."""
+    frame = bytearray(data[:frame_size])
+    played, pos = [bytes(frame)], frame_size
+    for _ in range(frames - 1):
+        pos = defb.apply_xor_delta(frame, data, pos)
+        played.append(bytes(frame))
+    assert pos == len(data)
+    return played
+
+
+def test_anim_delta_keyframes_unrelated_frames(tmp_path):
+    rng = random.Random(3)
+    cells = [random_cell(rng) for _ in range(6)]
+    sheet = str(tmp_path / "sheet.png")
+    write_sheet(sheet, cells)
+
+    report = {}
+    _, packed, _ = defb.convert_png_to_zx_defb_pypng(
+        sheet, sprite_width=8, sprite_height=8, anim_delta="rows", report=report
+    )
+    _, plain, _ = defb.convert_png_to_zx_defb_pypng(sheet, sprite_width=8, sprite_height=8)
+
+    stats = report["anim_delta"]
+    assert (stats["sparse"], stats["key"]) == (0, 5)
+    assert len(packed) == len(plain) + stats["key"]
+    assert defb.anim_delta_summary(stats).endswith(", 5 bytes of keyframe overhead")
+    frames = [bytes(plain[n * 8:(n + 1) * 8]) for n in range(6)]
+    assert play_animation(packed, 8, 6) == frames
+
+
+def test_anim_delta_sparse_related_frames(tmp_path):
+    rng = random.Random(5)
+    cells = [random_cell(rng)]
+    for _ in range(5):
+        cell = [row[:] for row in cells[-1]]
+        cell[rng.randrange(8)][rng.randrange(8)] ^= 1
+        cells.append(cell)
+    sheet = str(tmp_path / "sheet.png")
+    write_sheet(sheet, cells)
+
+    report = {}
+    _, packed, _ = defb.convert_png_to_zx_defb_pypng(
+        sheet, sprite_width=8, sprite_height=8, anim_delta="rows", report=report
+    )
+    _, plain, _ = defb.convert_png_to_zx_defb_pypng(sheet, sprite_width=8, sprite_height=8)
+
+    stats = report["anim_delta"]
+    assert (stats["sparse"], stats["key"]) == (5, 0)
+    assert stats["raw"] - stats["packed"] == len(plain) - len(packed) > 0
+    frames = [bytes(plain[n * 8:(n + 1) * 8]) for n in range(6)]
+    assert play_animation(packed, 8, 6) == frames